@@ -3,15 +3,11 @@ from typing import Any, Dict, List
 
 from optimum_benchmark import ORTConfig
 from optimum_benchmark.benchmark.config import BenchmarkConfig
-from optimum_benchmark.launchers.process.config import ProcessConfig
-from optimum_benchmark.scenarios.inference.config import InferenceConfig
 
 from llm_perf.common.benchmark_runner import LLMPerfBenchmarkManager
-from llm_perf.common.utils import (
-    CANONICAL_PRETRAINED_OPEN_LLM_LIST,
-    GENERATE_KWARGS,
-    INPUT_SHAPES,
-)
+from llm_perf.common.dependency import get_cpu_parallel_slots
+from llm_perf.common.scheduler import ExecutionSlot, get_cpu_execution_slots
+from llm_perf.common.utils import get_canonical_pretrained_open_llm_list
 
 
 class CPUOnnxRuntimeBenchmarkRunner(LLMPerfBenchmarkManager):
@@ -32,12 +28,15 @@ class CPUOnnxRuntimeBenchmarkRunner(LLMPerfBenchmarkManager):
                 "weights_config": weights_cfg,
             }
             for model, attn_impl, weights_cfg in product(
-                CANONICAL_PRETRAINED_OPEN_LLM_LIST,
+                get_canonical_pretrained_open_llm_list(),
                 self.attention_configs,
                 self.weights_configs.keys(),
             )
         ]
 
+    def get_execution_slots(self) -> List[ExecutionSlot]:
+        return get_cpu_execution_slots(get_cpu_parallel_slots())
+
     def get_benchmark_name(self, model: str, **kwargs) -> str:
         weights_config = kwargs["weights_config"]
         attn_implementation = kwargs["attn_implementation"]
@@ -54,17 +53,8 @@ class CPUOnnxRuntimeBenchmarkRunner(LLMPerfBenchmarkManager):
         torch_dtype = self.weights_configs[weights_config]["torch_dtype"]
         quant_config = self.weights_configs[weights_config]["quant_config"]
 
-        launcher_config = ProcessConfig()
-        scenario_config = InferenceConfig(
-            memory=True,
-            energy=True,
-            latency=True,
-            duration=10,
-            iterations=10,
-            warmup_runs=10,
-            input_shapes=INPUT_SHAPES,
-            generate_kwargs=GENERATE_KWARGS,
-        )
+        launcher_config = self.get_launcher_config()
+        scenario_config = self.get_scenario_config()
         backend_config = ORTConfig(
             model=model,
             device="cpu",
@@ -74,7 +64,7 @@ class CPUOnnxRuntimeBenchmarkRunner(LLMPerfBenchmarkManager):
             task="text-generation",
             torch_dtype=torch_dtype,
             quantization_config=quant_config,
-            model_kwargs={"trust_remote_code": True},
+            model_kwargs=self.get_model_kwargs(model),
         )
 
         return BenchmarkConfig(
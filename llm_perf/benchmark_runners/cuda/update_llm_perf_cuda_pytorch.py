@@ -1,23 +1,24 @@
 from itertools import product
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional
 
 from optimum_benchmark import PyTorchConfig
 from optimum_benchmark.benchmark.config import BenchmarkConfig
-from optimum_benchmark.launchers.process.config import ProcessConfig
-from optimum_benchmark.scenarios.inference.config import InferenceConfig
 
 from llm_perf.common.benchmark_runner import LLMPerfBenchmarkManager
-from llm_perf.common.utils import (
-    CANONICAL_PRETRAINED_OPEN_LLM_LIST,
-    GENERATE_KWARGS,
-    INPUT_SHAPES,
+from llm_perf.common.dependency import get_gpu_device_ids
+from llm_perf.common.scheduler import (
+    ExecutionSlot,
+    discover_gpu_devices,
+    get_gpu_execution_slots,
 )
+from llm_perf.common.utils import get_canonical_pretrained_open_llm_list
 
 
 class CUDAPyTorchBenchmarkRunner(LLMPerfBenchmarkManager):
     def __init__(self):
         super().__init__(backend="pytorch", device="cuda")
 
+        self._default_device_ids: Optional[str] = None
         self.attention_configs = self._get_attention_configs()
         assert (
             self.subset is not None
@@ -32,12 +33,41 @@ class CUDAPyTorchBenchmarkRunner(LLMPerfBenchmarkManager):
                 "weights_config": weights_cfg,
             }
             for model, attn_impl, weights_cfg in product(
-                CANONICAL_PRETRAINED_OPEN_LLM_LIST,
+                get_canonical_pretrained_open_llm_list(),
                 self.attention_configs,
                 self.weights_configs.keys(),
             )
         ]
 
+    def discover_devices(self) -> List[str]:
+        """
+        Returns the GPUs to schedule benchmarks on, can be overridden to simulate devices
+        """
+        return get_gpu_device_ids() or discover_gpu_devices()
+
+    @property
+    def default_device_ids(self) -> str:
+        """
+        The GPU of the benchmarks run outside of an execution slot, the first GPU to
+        schedule on
+        """
+        if self._default_device_ids is None:
+            try:
+                device_ids = self.discover_devices()
+            except Exception:
+                device_ids = []
+            self._default_device_ids = device_ids[0] if device_ids else "0"
+        return self._default_device_ids
+
+    def get_execution_slots(self) -> List[ExecutionSlot]:
+        try:
+            return get_gpu_execution_slots(self.discover_devices)
+        except Exception as e:
+            self.logger.warning(
+                f"Could not discover the GPUs of this machine, running benchmarks serially, error:\n{e}"
+            )
+            return []
+
     def get_benchmark_name(self, model: str, **kwargs) -> str:
         weights_config = kwargs["weights_config"]
         attn_implementation = kwargs["attn_implementation"]
@@ -63,23 +93,16 @@ class CUDAPyTorchBenchmarkRunner(LLMPerfBenchmarkManager):
         quant_scheme = self.weights_configs[weights_config]["quant_scheme"]
         quant_config = self.weights_configs[weights_config]["quant_config"]
 
-        launcher_config = ProcessConfig(
+        launcher_config = self.get_launcher_config(
             device_isolation=True, device_isolation_action="kill"
         )
-        scenario_config = InferenceConfig(
-            memory=True,
-            energy=True,
-            latency=True,
-            duration=10,
-            iterations=10,
-            warmup_runs=10,
-            input_shapes=INPUT_SHAPES,
-            generate_kwargs=GENERATE_KWARGS,
-        )
+        scenario_config = self.get_scenario_config()
         backend_config = PyTorchConfig(
             model=model,
             device="cuda",
-            device_ids="0",
+            device_ids=self.current_slot.device_ids
+            if self.current_slot
+            else self.default_device_ids,
             no_weights=True,
             library="transformers",
             task="text-generation",
@@ -87,7 +110,7 @@ class CUDAPyTorchBenchmarkRunner(LLMPerfBenchmarkManager):
             quantization_scheme=quant_scheme,
             quantization_config=quant_config,
             attn_implementation=attn_implementation,
-            model_kwargs={"trust_remote_code": True},
+            model_kwargs=self.get_model_kwargs(model),
         )
 
         return BenchmarkConfig(
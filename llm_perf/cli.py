@@ -1,24 +1,11 @@
 import os
 import warnings
 from enum import Enum
+from typing import Optional
 
 import typer
 from dotenv import load_dotenv
 
-from llm_perf.benchmark_runners.cpu.update_llm_perf_cpu_onnxruntime import (
-    CPUOnnxRuntimeBenchmarkRunner,
-)
-from llm_perf.benchmark_runners.cpu.update_llm_perf_cpu_openvino import (
-    CPUOpenVINOBenchmarkRunner,
-)
-from llm_perf.benchmark_runners.cpu.update_llm_perf_cpu_pytorch import (
-    CPUPyTorchBenchmarkRunner,
-)
-from llm_perf.benchmark_runners.cuda.update_llm_perf_cuda_pytorch import (
-    CUDAPyTorchBenchmarkRunner,
-)
-
-from llm_perf.update_llm_perf_leaderboard import update_llm_perf_leaderboard
 
 if os.environ.get("DISABLE_WARNINGS", "0") == "1":
     warnings.filterwarnings("ignore")
@@ -37,12 +24,47 @@ class Backend(str, Enum):
     OPENVINO = "openvino"
 
 
+DURATION_UNITS = {"s": 1, "m": 60, "h": 60 * 60, "d": 24 * 60 * 60}
+
+
+def parse_duration(duration: str) -> float:
+    try:
+        if duration[-1:].lower() in DURATION_UNITS:
+            return float(duration[:-1]) * DURATION_UNITS[duration[-1].lower()]
+        return float(duration)
+    except ValueError:
+        raise typer.BadParameter(
+            f"Invalid duration {duration}, expected e.g. 90m or 6h"
+        ) from None
+
+
 @app.command()
 def run_benchmark(
     hardware: Hardware = typer.Option(..., help="Hardware to run on: CPU or CUDA"),
     backend: Backend = typer.Option(
         ..., help="Backend to use: ONNXRUNTIME, PYTORCH, or OPENVINO"
     ),
+    reconcile: bool = typer.Option(
+        False,
+        help="Reconcile the local run journal with the benchmarks pushed to the Hub",
+    ),
+    time_budget: Optional[str] = typer.Option(
+        None,
+        help="Wall-clock budget of the run, in seconds or with a unit (e.g. 90m, 6h), "
+        "only the benchmarks predicted to complete within it are started",
+    ),
+    shard_index: Optional[int] = typer.Option(
+        None, help="Shard of the benchmarks to run, defaults to SHARD_INDEX or 0"
+    ),
+    shard_count: Optional[int] = typer.Option(
+        None,
+        help="Number of machines sharing the benchmarks, defaults to SHARD_COUNT or 1",
+    ),
+    work_queue: Optional[str] = typer.Option(
+        None,
+        help="Work queue shared with other workers to claim benchmarks from, e.g. "
+        "sqlite:///shared/campaign.sqlite, defaults to WORK_QUEUE",
+    ),
 ):
     env_vars = load_dotenv()
     if env_vars:
@@ -50,26 +72,71 @@ def run_benchmark(
     else:
         print("No environment variables loaded")
 
+    # runners (and the benchmarking stack they pull in) are only imported when needed
     if hardware == Hardware.CPU:
         if backend == Backend.ONNXRUNTIME:
+            from llm_perf.benchmark_runners.cpu.update_llm_perf_cpu_onnxruntime import (
+                CPUOnnxRuntimeBenchmarkRunner,
+            )
+
             runner = CPUOnnxRuntimeBenchmarkRunner()
         elif backend == Backend.PYTORCH:
+            from llm_perf.benchmark_runners.cpu.update_llm_perf_cpu_pytorch import (
+                CPUPyTorchBenchmarkRunner,
+            )
+
             runner = CPUPyTorchBenchmarkRunner()
         elif backend == Backend.OPENVINO:
+            from llm_perf.benchmark_runners.cpu.update_llm_perf_cpu_openvino import (
+                CPUOpenVINOBenchmarkRunner,
+            )
+
             runner = CPUOpenVINOBenchmarkRunner()
     elif hardware == Hardware.CUDA:
         if backend == Backend.PYTORCH:
+            from llm_perf.benchmark_runners.cuda.update_llm_perf_cuda_pytorch import (
+                CUDAPyTorchBenchmarkRunner,
+            )
+
             runner = CUDAPyTorchBenchmarkRunner()
         else:
             typer.echo(f"CUDA is not supported for {backend} backend")
             raise typer.Exit(code=1)
 
-    runner.run_benchmarks()
+    runner.run_benchmarks(
+        reconcile=reconcile,
+        time_budget=parse_duration(time_budget) if time_budget is not None else None,
+        shard_index=shard_index,
+        shard_count=shard_count,
+        work_queue=work_queue,
+    )
 
 
 @app.command()
-def update_leaderboard():
-    update_llm_perf_leaderboard()
+def update_leaderboard(
+    incremental: bool = typer.Option(
+        False,
+        help="Only parse the benchmark files that changed since the previous run",
+    ),
+    workers: int = typer.Option(
+        4,
+        help="Number of perf dataframes refreshed concurrently, 1 to refresh them serially",
+    ),
+    fail_on_regression: bool = typer.Option(
+        False,
+        help="Do not publish the perf dataframes with performance regressions and exit with code 1",
+    ),
+):
+    from llm_perf.update_llm_perf_leaderboard import update_llm_perf_leaderboard
+
+    num_regressions = update_llm_perf_leaderboard(
+        incremental=incremental,
+        max_workers=workers,
+        fail_on_regression=fail_on_regression,
+    )
+    if num_regressions and fail_on_regression:
+        typer.echo(f"Found {num_regressions} performance regressions")
+        raise typer.Exit(code=1)
 
 
 if __name__ == "__main__":
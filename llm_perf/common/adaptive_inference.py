@@ -0,0 +1,99 @@
+import math
+from dataclasses import dataclass, field
+from typing import Dict, List
+
+from optimum_benchmark import BenchmarkConfig, BenchmarkReport
+from optimum_benchmark.scenarios.inference.config import InferenceConfig
+from scipy.stats import t as student_t
+
+# targets whose latency precision drives the stopping rule and is recorded
+PRECISION_TARGETS = ["prefill", "decode"]
+
+
+@dataclass
+class AdaptiveInferenceConfig(InferenceConfig):
+    """
+    Inference scenario that samples until the latencies are precise enough instead of
+    for a fixed budget.
+
+    `iterations` and `duration` become the minimum number of samples and the minimum
+    sampling time, and `warmup_runs` the maximum number of warm-up runs: warm-up stops
+    as soon as the latency of consecutive windows of runs settles.
+    """
+
+    _target_: str = "llm_perf.common.adaptive_scenario.AdaptiveInferenceScenario"
+
+    # sampling stops once the confidence interval of the mean latency of every
+    # target is narrower than this fraction of the mean (on each side)
+    target_relative_precision: float = 0.02
+    confidence: float = 0.95
+    # sampling stops after this many seconds whatever the precision
+    max_duration: int = 30
+
+    # warm-up is over when the mean latency of the last `warmup_window` runs is within
+    # `warmup_tolerance` of the mean of the window before it
+    warmup_window: int = 3
+    warmup_tolerance: float = 0.05
+
+    # filled in by the main process from the returned latencies
+    achieved_precision: Dict[str, float] = field(default_factory=dict)
+
+    def __post_init__(self):
+        super().__post_init__()
+
+        # a confidence interval needs at least two samples
+        self.iterations = max(self.iterations, 2)
+        if self.max_duration < self.duration:
+            raise ValueError(
+                f"`max_duration` ({self.max_duration}) must be at least `duration` ({self.duration})"
+            )
+
+
+def relative_ci_half_width(values: List[float], confidence: float) -> float:
+    """
+    Returns the half width of the Student-t confidence interval of the mean of `values`,
+    relative to that mean.
+    """
+    n = len(values)
+    if n < 2:
+        return math.inf
+
+    mean = sum(values) / n
+    if mean == 0:
+        return math.inf
+
+    variance = sum((value - mean) ** 2 for value in values) / (n - 1)
+    half_width = student_t.ppf((1 + confidence) / 2, n - 1) * math.sqrt(variance / n)
+    return half_width / abs(mean)
+
+
+def is_warmed_up(latencies: List[float], window: int, tolerance: float) -> bool:
+    """
+    Whether the mean of the last `window` latencies is within `tolerance` (relative) of
+    the mean of the `window` latencies before them.
+    """
+    if len(latencies) < 2 * window:
+        return False
+
+    last = sum(latencies[-window:]) / window
+    previous = sum(latencies[-2 * window : -window]) / window
+    return abs(last - previous) <= tolerance * previous
+
+
+def record_achieved_precision(
+    benchmark_config: BenchmarkConfig, benchmark_report: BenchmarkReport
+):
+    """
+    Stores the relative precision reached by each target in the scenario config, so that
+    it is published in the benchmark next to the measurements.
+    """
+    scenario_config = benchmark_config.scenario
+    if not isinstance(scenario_config, AdaptiveInferenceConfig):
+        return
+
+    for target in PRECISION_TARGETS:
+        latency = getattr(getattr(benchmark_report, target, None), "latency", None)
+        if latency is not None:
+            scenario_config.achieved_precision[target] = relative_ci_half_width(
+                latency.values, scenario_config.confidence
+            )
@@ -0,0 +1,150 @@
+import time
+from typing import Callable, List
+
+import torch
+from optimum_benchmark.scenarios.inference.scenario import (
+    DECODE_THROUGHPUT_UNIT,
+    GENERATE_THROUGHPUT_UNIT,
+    PREFILL_THROUGHPUT_UNIT,
+    TEXT_GENERATION_PREFILL_OVERRIDES,
+    TEXT_GENERATION_WARMUP_OVERRIDES,
+    InferenceScenario,
+)
+from optimum_benchmark.trackers.latency import Throughput
+
+from llm_perf.common.adaptive_inference import (
+    AdaptiveInferenceConfig,
+    is_warmed_up,
+    relative_ci_half_width,
+)
+
+
+class AdaptiveInferenceScenario(InferenceScenario):
+    """
+    Inference scenario of `AdaptiveInferenceConfig`: text generation is warmed up until
+    its latency settles and sampled until its latencies are precise enough.
+    Runs in the isolated benchmark process, other tasks behave as `InferenceScenario`.
+    """
+
+    config: AdaptiveInferenceConfig
+
+    def _synchronize(self):
+        if self.backend.config.device == "cuda" and torch.cuda.is_available():
+            torch.cuda.synchronize()
+
+    def _keep_sampling(
+        self, tracker, get_samples: Callable[[], List[List[float]]]
+    ) -> bool:
+        elapsed, count = tracker.elapsed(), tracker.count()
+        if elapsed < self.config.duration or count < self.config.iterations:
+            return True
+        if elapsed >= self.config.max_duration:
+            self.logger.warning(
+                f"\t+ Stopping after {count} samples without reaching the target precision"
+            )
+            return False
+
+        return any(
+            relative_ci_half_width(values, self.config.confidence)
+            > self.config.target_relative_precision
+            for values in get_samples()
+        )
+
+    def warmup_text_generation(self):
+        self.logger.info("\t+ Warming up backend for Text Generation")
+        self.backend.generate(self.inputs, self.config.generate_kwargs)
+
+        with self.global_tracking(target="first_generate"):
+            self.backend.generate(self.inputs, self.config.generate_kwargs)
+
+        warmup_kwargs = {
+            **self.config.generate_kwargs,
+            **TEXT_GENERATION_WARMUP_OVERRIDES,
+        }
+        latencies = []
+        while len(latencies) < self.config.warmup_runs:
+            start = time.perf_counter()
+            self.backend.generate(self.inputs, warmup_kwargs)
+            self._synchronize()
+            latencies.append(time.perf_counter() - start)
+
+            if is_warmed_up(
+                latencies, self.config.warmup_window, self.config.warmup_tolerance
+            ):
+                break
+
+        self.logger.info(f"\t+ Warm-up settled after {len(latencies)} runs")
+
+    def run_per_token_text_generation_latency_tracking(self):
+        self.logger.info(
+            "\t+ Running adaptive Per-Token Text Generation latency tracking"
+        )
+
+        tracker = self.per_token_latency_tracker
+        with tracker.session():
+            while self._keep_sampling(
+                tracker,
+                lambda: [
+                    tracker.get_prefill_latency().values,
+                    tracker.get_decode_latency().values,
+                ],
+            ):
+                with tracker.track():
+                    self.backend.generate(self.inputs, self.config.generate_kwargs)
+
+        per_token_latency = tracker.get_per_token_latency()
+        generate_latency = tracker.get_generate_latency()
+        prefill_latency = tracker.get_prefill_latency()
+        decode_latency = tracker.get_decode_latency()
+
+        self.report.per_token.latency = per_token_latency
+        self.report.generate.latency = generate_latency
+        self.report.prefill.latency = prefill_latency
+        self.report.decode.latency = decode_latency
+
+        self.report.generate.throughput = Throughput.from_latency(
+            generate_latency, self.atomic_decode_volume, unit=GENERATE_THROUGHPUT_UNIT
+        )
+        self.report.prefill.throughput = Throughput.from_latency(
+            prefill_latency, self.atomic_prefill_volume, unit=PREFILL_THROUGHPUT_UNIT
+        )
+        self.report.decode.throughput = Throughput.from_latency(
+            decode_latency, self.atomic_decode_volume, unit=DECODE_THROUGHPUT_UNIT
+        )
+
+    def run_text_generation_latency_tracking(self):
+        self.logger.info("\t+ Running adaptive Text Generation latency tracking")
+
+        prefill_kwargs = {
+            **self.config.generate_kwargs,
+            **TEXT_GENERATION_PREFILL_OVERRIDES,
+        }
+
+        tracker = self.latency_tracker
+        with tracker.session():
+            while self._keep_sampling(tracker, lambda: [tracker.get_latency().values]):
+                with tracker.track():
+                    self.backend.prefill(self.inputs, prefill_kwargs)
+
+        prefill_latency = tracker.get_latency()
+        self.report.prefill.latency = prefill_latency
+        self.report.prefill.throughput = Throughput.from_latency(
+            prefill_latency, self.atomic_prefill_volume, unit=PREFILL_THROUGHPUT_UNIT
+        )
+
+        with tracker.session():
+            while self._keep_sampling(tracker, lambda: [tracker.get_latency().values]):
+                with tracker.track():
+                    self.backend.generate(self.inputs, self.config.generate_kwargs)
+
+        generate_latency = tracker.get_latency()
+        self.report.generate.latency = generate_latency
+        self.report.generate.throughput = Throughput.from_latency(
+            generate_latency, self.atomic_generate_volume, unit=GENERATE_THROUGHPUT_UNIT
+        )
+
+        decode_latency = generate_latency - prefill_latency
+        self.report.decode.latency = decode_latency
+        self.report.decode.throughput = Throughput.from_latency(
+            decode_latency, self.atomic_decode_volume, unit=DECODE_THROUGHPUT_UNIT
+        )
@@ -0,0 +1,78 @@
+import json
+from typing import Any, Dict, Iterable, List
+
+import pandas as pd
+
+
+def add_stdev_(obj: Any) -> None:
+    """
+    Adds a 'stdev_' key with the same value as 'stdev' to every dictionary that has a
+    'stdev' key but no 'stdev_' key, in place.
+    This is to make the old optimum benchmark compatible with the new one.
+    """
+    if isinstance(obj, dict):
+        if "stdev" in obj and "stdev_" not in obj:
+            obj["stdev_"] = obj["stdev"]
+        for value in obj.values():
+            if isinstance(value, (dict, list)):
+                add_stdev_(value)
+    elif isinstance(obj, list):
+        for item in obj:
+            if isinstance(item, (dict, list)):
+                add_stdev_(item)
+
+
+def flatten_benchmark(data: Dict[str, Any], prefix: str = "") -> Dict[str, Any]:
+    """
+    Flattens a benchmark dictionary into dot-separated keys, the same way
+    `Benchmark.to_dataframe` does: nested dictionaries are flattened, empty ones are
+    dropped and every other value (including lists) is kept as is.
+    """
+    flat = {}
+    for key, value in data.items():
+        if isinstance(value, dict):
+            flat.update(flatten_benchmark(value, prefix=f"{prefix}{key}."))
+        else:
+            flat[f"{prefix}{key}"] = value
+    return flat
+
+
+def read_flat_benchmark(file: str) -> Dict[str, Any]:
+    """
+    Reads a benchmark.json file once, patches it in memory and flattens it.
+    The file itself is left untouched.
+    """
+    with open(file, "r") as f:
+        data = json.load(f)
+    add_stdev_(data)
+    return flatten_benchmark(data)
+
+
+class BenchmarkColumns:
+    """
+    Accumulates flat benchmarks into one list per column, so that building the final
+    dataframe is a single allocation instead of a concatenation of one-row dataframes.
+    Columns appear in the order they are first seen, and values missing from a row are
+    filled with None, like `pd.concat` would.
+    """
+
+    def __init__(self):
+        self.columns: Dict[str, List[Any]] = {}
+        self.num_rows = 0
+
+    def append(self, flat_benchmark: Dict[str, Any]) -> None:
+        for key in flat_benchmark:
+            if key not in self.columns:
+                self.columns[key] = [None] * self.num_rows
+        for key, column in self.columns.items():
+            column.append(flat_benchmark.get(key))
+        self.num_rows += 1
+
+    def extend(self, flat_benchmarks: Iterable[Dict[str, Any]]) -> None:
+        for flat_benchmark in flat_benchmarks:
+            self.append(flat_benchmark)
+
+    def to_dataframe(self) -> pd.DataFrame:
+        # object columns, like the one-row dataframes of `Benchmark.to_dataframe`,
+        # so that the written CSV files stay the same
+        return pd.DataFrame(self.columns, columns=list(self.columns), dtype=object)
@@ -1,18 +1,85 @@
 import os
+import socket
+import threading
+import time
 import traceback
 from abc import ABC, abstractmethod
 from logging import getLogger
-from typing import Any, Dict, List, Optional
+from typing import Any, Callable, Dict, Hashable, List, Optional, Set, Tuple
 
 from optimum_benchmark import Benchmark, BenchmarkConfig, BenchmarkReport
+from huggingface_hub import hf_hub_download
+from optimum_benchmark.launchers.process.config import ProcessConfig
 from optimum_benchmark.logging_utils import setup_logging
+from optimum_benchmark.scenarios.inference.config import InferenceConfig
 
+from llm_perf.common.adaptive_inference import (
+    AdaptiveInferenceConfig,
+    record_achieved_precision,
+)
+from llm_perf.common.completion_index import BenchmarkCompletionIndex, is_complete
+from llm_perf.common.cost_model import (
+    DEFAULT_NUM_PARAMETERS,
+    PRODUCT_ORDER,
+    BenchmarkCostModel,
+    assign_shards,
+    estimate_num_parameters,
+    get_bits_per_parameter,
+    load_model_config,
+    order_benchmarks,
+    parse_num_parameters,
+    select_within_budget,
+)
+from llm_perf.common.cpu_partition import format_cpu_list
+from llm_perf.common.cache import read_json
+from llm_perf.common.dependency import (
+    get_benchmark_order,
+    get_machine_memory,
+    get_shard_count,
+    get_shard_index,
+    get_trace_dir,
+    get_work_queue,
+    get_work_queue_lease_duration,
+    get_prefetch_workers,
+    get_sweep_batch_sizes,
+    get_sweep_sequence_lengths,
+    get_transient_failure_retries,
+    is_adaptive_sampling,
+    is_grouped_execution,
+    is_shape_sweep,
+    is_warm_workers,
+)
+from llm_perf.common.grouped_execution import launch_benchmark_group
+from llm_perf.common.hardware_config import get_hardware_config
+from llm_perf.common.memory_model import MemoryEstimate, estimate_memory, fits_in_memory
+from llm_perf.common.prefetch import prefetch_model_artifacts
+from llm_perf.common.run_journal import SKIPPED, RunJournal
+from llm_perf.common.scheduler import ExecutionSlot, SlotScheduler
+from llm_perf.common.shape_sweep import find_max_batch_size
+from llm_perf.common.skip_list import (
+    DETERMINISTIC,
+    FailureSkipList,
+    classify_failure,
+    is_out_of_memory,
+)
+from llm_perf.common.tracing import TRACER
+from llm_perf.common.uploader import BenchmarkUploader
+from llm_perf.common.warm_process import (
+    WarmProcessConfig,
+    get_preload_modules,
+    start_fork_server,
+)
+from llm_perf.common.work_queue import LeaseRenewer, WorkQueue, open_work_queue
 from llm_perf.common.utils import (
-    CANONICAL_PRETRAINED_OPEN_LLM_LIST,
-    OPEN_LLM_LIST,
-    PRETRAINED_OPEN_LLM_LIST,
+    GENERATE_KWARGS,
+    INPUT_SHAPES,
+    get_canonical_pretrained_open_llm_list,
+    get_pinned_num_parameters,
 )
 
+# time kept at the end of a time budget to flush the pending uploads
+UPLOAD_FLUSH_MARGIN = 120.0
+
 
 class LLMPerfBenchmarkManager(ABC):
     def __init__(
@@ -27,6 +94,20 @@ class LLMPerfBenchmarkManager(ABC):
         self.subset = subset or os.getenv("SUBSET", None)
         self.machine = machine or os.getenv("MACHINE", None)
         self.logger = getLogger("llm-perf-backend")
+        self.completion_index: Optional[BenchmarkCompletionIndex] = None
+        self.scheduler: Optional[SlotScheduler] = None
+        self.uploader: Optional[BenchmarkUploader] = None
+        self.skip_list: Optional[FailureSkipList] = None
+        self.journal: Optional[RunJournal] = None
+        self.prefetched_models: Set[str] = set()
+        self.model_snapshots: Dict[str, str] = {}
+        self.model_configs: Dict[str, Optional[Dict[str, Any]]] = {}
+        self.deadline: Optional[float] = None
+        self.predicted_durations: Dict[str, float] = {}
+        self.work_queue: Optional[WorkQueue] = None
+        self.memory_capacity: Optional[float] = None
+        # subfolders of the benchmarks skipped by this run since they would not fit
+        self.memory_skipped: Set[str] = set()
 
         if self.machine is None and self.subset is None:
             self.push_repo_id = (
@@ -41,14 +122,6 @@ class LLMPerfBenchmarkManager(ABC):
                 "Either both MACHINE and SUBSET should be set for benchmarking or neither for debugging"
             )
 
-        self.logger.info(f"len(OPEN_LLM_LIST): {len(OPEN_LLM_LIST)}")
-        self.logger.info(
-            f"len(PRETRAINED_OPEN_LLM_LIST): {len(PRETRAINED_OPEN_LLM_LIST)}"
-        )
-        self.logger.info(
-            f"len(CANONICAL_PRETRAINED_OPEN_LLM_LIST): {len(CANONICAL_PRETRAINED_OPEN_LLM_LIST)}"
-        )
-
     @abstractmethod
     def _get_weights_configs(self, subset: str) -> Dict[str, Dict[str, Any]]:
         raise NotImplementedError(
@@ -73,35 +146,567 @@ class LLMPerfBenchmarkManager(ABC):
             "This method should be implemented in the child class"
         )
 
-    def run_benchmarks(self):
+    def get_execution_slots(self) -> List[ExecutionSlot]:
+        """
+        Can be overridden by child classes to run several benchmarks concurrently,
+        one per returned slot
+        """
+        return []
+
+    def run_benchmarks(
+        self,
+        reconcile: bool = False,
+        time_budget: Optional[float] = None,
+        shard_index: Optional[int] = None,
+        shard_count: Optional[int] = None,
+        work_queue: Optional[str] = None,
+    ):
+        """
+        Runs every benchmark that was not conducted yet, as recorded by the local run
+        journal. The journal is reconciled with the push repo on the first run or when
+        `reconcile` is set, otherwise the push repo is not queried.
+        With a `time_budget` in seconds, only the benchmarks predicted to complete
+        within the budget are run, shortest first, and the pending uploads are flushed
+        before the budget runs out.
+        With `shard_count` > 1 (defaults to `SHARD_COUNT`), only the benchmarks of shard
+        `shard_index` (defaults to `SHARD_INDEX`) are run.
+        With a `work_queue` URL (defaults to `WORK_QUEUE`), the benchmarks are added to
+        the queue and claimed one at a time, along with the other workers of the queue
+        """
+        if time_budget is not None:
+            self.deadline = time.monotonic() + time_budget
+        work_queue = work_queue or get_work_queue()
+        if work_queue is not None:
+            self.work_queue = open_work_queue(
+                work_queue, lease_duration=get_work_queue_lease_duration()
+            )
         os.environ["LOG_TO_FILE"] = "0"
         os.environ["LOG_LEVEL"] = "INFO"
         setup_logging(level="INFO", prefix="MAIN-PROCESS")
 
-        benchmarks_to_run = self.get_list_of_benchmarks_to_run()
+        with TRACER.span("get_list_of_benchmarks_to_run"):
+            benchmarks_to_run = self.get_list_of_benchmarks_to_run()
+        for benchmark_name in benchmarks_to_run:
+            assert "model" in benchmark_name, "each benchmark should have a model"
+
+        benchmarks_to_run = self.shard_benchmarks(
+            benchmarks_to_run,
+            shard_index=get_shard_index() if shard_index is None else shard_index,
+            shard_count=get_shard_count() if shard_count is None else shard_count,
+        )
+        self.load_run_journal(reconcile)
+        self.journal.add_pending(
+            self.get_benchmark_subfolder(**benchmark_name)
+            for benchmark_name in benchmarks_to_run
+        )
+        self.skip_list = FailureSkipList.for_repo(self.push_repo_id)
+        self.logger.info(
+            f"Loaded skip list with {len(self.skip_list)} failing configurations"
+        )
+        self.memory_capacity = self.get_memory_capacity()
+        if self.memory_capacity is not None:
+            self.logger.info(
+                "Skipping the benchmarks not expected to fit in "
+                f"{self.memory_capacity:.0f}GB of memory"
+            )
 
         self.logger.info(
             f"Running a total of {len(benchmarks_to_run)} benchmarks, "
-            f"with {len(CANONICAL_PRETRAINED_OPEN_LLM_LIST)} models"
+            f"with {len(get_canonical_pretrained_open_llm_list())} models"
+        )
+
+        self.prefetch_models(benchmarks_to_run)
+        if is_warm_workers():
+            with TRACER.span("start_fork_server"):
+                start_fork_server(get_preload_modules(self.backend))
+        if self.deadline is not None:
+            benchmarks_to_run = self.select_benchmarks_within_budget(benchmarks_to_run)
+        else:
+            benchmarks_to_run = self.order_benchmarks(benchmarks_to_run)
+
+        self.uploader = BenchmarkUploader(
+            self.push_repo_id, on_commit=self.on_artifacts_pushed
+        )
+        self.uploader.install_signal_handlers()
+        try:
+            self.execute_benchmarks(benchmarks_to_run)
+        finally:
+            self.logger.info("Flushing pending uploads")
+            with TRACER.span("flush_uploads"):
+                self.uploader.close(
+                    timeout=max(self.get_remaining_time(), UPLOAD_FLUSH_MARGIN)
+                    if self.deadline is not None
+                    else None
+                )
+            self.uploader = None
+            self.export_trace()
+
+    def export_trace(self):
+        """
+        Logs where the time of the run went and exports its spans as a Chrome trace
+        """
+        trace_file = os.path.join(
+            get_trace_dir(),
+            f"run-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}.json",
+        )
+        TRACER.export(trace_file)
+        self.logger.info(
+            f"Orchestration phases of the run, trace exported to {trace_file}:\n"
+            f"{TRACER.format_summary()}"
+        )
+
+    def execute_benchmarks(self, benchmarks_to_run: List[Dict[str, Any]]):
+        grouped_execution = is_grouped_execution()
+        if grouped_execution and self.device != "cuda":
+            # the RSS of the group process is not given back between benchmarks, and
+            # max_ram is the memory metric of the benchmarks that do not run on CUDA
+            self.logger.warning(
+                f"GROUPED_EXECUTION is ignored on {self.device}, only CUDA benchmarks "
+                "reset their memory metrics between the benchmarks of a group"
+            )
+            grouped_execution = False
+
+        if is_shape_sweep():
+            self.logger.info(
+                f"Sweeping batch sizes {get_sweep_batch_sizes()} and sequence lengths "
+                f"{get_sweep_sequence_lengths()} for {len(benchmarks_to_run)} benchmarks"
+            )
+
+            def task(benchmark_name):
+                self.run_shape_sweep(**benchmark_name)
+
+            items = benchmarks_to_run
+        elif grouped_execution:
+            benchmark_groups = self.group_benchmarks(benchmarks_to_run)
+            self.logger.info(
+                f"Running {len(benchmarks_to_run)} benchmarks in {len(benchmark_groups)} groups"
+            )
+            task, items = self.run_benchmark_group, benchmark_groups
+        else:
+
+            def task(benchmark_name):
+                self.run_benchmark(**benchmark_name)
+
+            items = benchmarks_to_run
+
+        execution_slots = self.get_execution_slots()
+        if self.work_queue is not None:
+            task, items = self.pull_from_work_queue(
+                task, items, num_workers=max(1, len(execution_slots))
+            )
+
+        if len(execution_slots) > 1:
+            self.logger.info(
+                f"Running benchmarks concurrently on {len(execution_slots)} slots: {execution_slots}"
+            )
+            self.scheduler = SlotScheduler(execution_slots)
+            try:
+                self.scheduler.run(task, items)
+            finally:
+                self.scheduler = None
+        else:
+            for item in items:
+                task(item)
+
+    def get_work_item_key(self, item) -> str:
+        """
+        Key of a benchmark, or of a group of benchmarks, in the work queue
+        """
+        if isinstance(item, list):
+            return "+".join(
+                self.get_benchmark_subfolder(**benchmark_name)
+                for benchmark_name in item
+            )
+        return self.get_benchmark_subfolder(**item)
+
+    def pull_from_work_queue(
+        self, task: Callable[[Any], None], items: List[Any], num_workers: int
+    ) -> Tuple[Callable[[Any], None], List[Any]]:
+        """
+        Adds the items to the work queue, and returns a worker task, to run once per
+        execution slot, that claims items from the queue and runs `task` on them until
+        no item is pending or claimed by another worker. An item is returned to the queue
+        if its task is interrupted
+        """
+        self.work_queue.add((self.get_work_item_key(item), item) for item in items)
+        self.logger.info(
+            f"Pulling benchmarks from the work queue with {num_workers} workers: "
+            f"{self.work_queue.count_by_state()}"
         )
 
+        def work(_):
+            thread = threading.current_thread().name
+            worker = f"{socket.gethostname()}-{os.getpid()}-{thread}"
+
+            def should_stop() -> bool:
+                # nothing claimed once the time budget is spent would be run anyway
+                return (
+                    self.deadline is not None
+                    and self.get_remaining_time() <= UPLOAD_FLUSH_MARGIN
+                )
+
+            while self.current_slot is None or self.scheduler.is_slot_healthy(
+                self.current_slot
+            ):
+                lease = self.work_queue.claim_or_wait(worker, should_stop=should_stop)
+                if lease is None:
+                    return
+                if not self.has_time_for(lease.key):
+                    self.work_queue.release(lease)
+                    return
+
+                with LeaseRenewer(self.work_queue, lease):
+                    try:
+                        task(lease.payload)
+                    except BaseException:
+                        self.work_queue.release(lease)
+                        raise
+                self.work_queue.complete(lease)
+
+        return work, [None] * num_workers
+
+    def get_benchmark_group_key(self, **kwargs) -> Hashable:
+        """
+        Benchmarks with the same key run in a single process in grouped execution,
+        by default all the attention implementations of a model at one weights config.
+        Can be overridden by child classes
+        """
+        return (kwargs["model"], kwargs.get("weights_config"))
+
+    def group_benchmarks(
+        self, benchmarks_to_run: List[Dict[str, Any]]
+    ) -> List[List[Dict[str, Any]]]:
+        benchmark_groups: Dict[Hashable, List[Dict[str, Any]]] = {}
         for benchmark_name in benchmarks_to_run:
-            assert "model" in benchmark_name, "each benchmark should have a model"
+            key = self.get_benchmark_group_key(**benchmark_name)
+            benchmark_groups.setdefault(key, []).append(benchmark_name)
+        return list(benchmark_groups.values())
+
+    @TRACER.span("prefetch_models")
+    def prefetch_models(self, benchmarks_to_run: List[Dict[str, Any]]):
+        """
+        Downloads the configs, tokenizers and remote code of every model concurrently,
+        so that the benchmarks of these models resolve them from the cache without
+        network access
+        """
+        num_workers = get_prefetch_workers()
+        if num_workers < 1:
+            return
+
+        models = list(
+            dict.fromkeys(benchmark["model"] for benchmark in benchmarks_to_run)
+        )
+        start = time.perf_counter()
+        self.model_snapshots = prefetch_model_artifacts(models, max_workers=num_workers)
+        self.prefetched_models = set(self.model_snapshots)
+        self.logger.info(
+            f"Prefetched {len(self.prefetched_models)}/{len(models)} models "
+            f"in {time.perf_counter() - start:.1f}s"
+        )
+
+    def get_model_kwargs(self, model: str) -> Dict[str, Any]:
+        """
+        Model kwargs of the benchmarks of a model, prefetched models are loaded offline
+        """
+        model_kwargs = {"trust_remote_code": True}
+        if model in self.prefetched_models:
+            model_kwargs["local_files_only"] = True
+        return model_kwargs
+
+    def get_weights_config(self, **kwargs) -> Dict[str, Any]:
+        """
+        The weights config (dtype and quantization) of a benchmark, used to estimate its
+        cost. Can be overridden by child classes that do not list them in `weights_configs`
+        """
+        weights_configs = getattr(self, "weights_configs", {})
+        return weights_configs.get(kwargs.get("weights_config"), {})
+
+    def get_model_config(self, model: str) -> Optional[Dict[str, Any]]:
+        if model not in self.model_configs:
+            self.model_configs[model] = load_model_config(
+                model, self.model_snapshots.get(model)
+            )
+        return self.model_configs[model]
+
+    def estimate_weights_size(self, model: str, **kwargs) -> Optional[float]:
+        """
+        Gigabytes of weights loaded by a benchmark, from the model's config and the
+        benchmark's dtype or quantization, None if the model's config is not available
+        """
+        model_config = self.get_model_config(model)
+        num_parameters = (
+            estimate_num_parameters(model_config) if model_config is not None else None
+        )
+        if num_parameters is None:
+            return None
+        bits = get_bits_per_parameter(self.get_weights_config(**kwargs))
+        return num_parameters * bits / 8 / 1e9
+
+    def predict_benchmark_durations(
+        self, benchmarks_to_run: List[Dict[str, Any]]
+    ) -> List[float]:
+        """
+        Predicts the duration in seconds of every benchmark, from the size of its weights
+        and the durations recorded in the run journal
+        """
+        subfolders = [
+            self.get_benchmark_subfolder(**benchmark_name)
+            for benchmark_name in benchmarks_to_run
+        ]
+        weights_sizes = [
+            self.estimate_weights_size(**benchmark_name)
+            for benchmark_name in benchmarks_to_run
+        ]
+        cost_model = BenchmarkCostModel(
+            durations=self.journal.get_durations() if self.journal is not None else {},
+            weights_sizes={
+                subfolder: weights_size
+                for subfolder, weights_size in zip(subfolders, weights_sizes)
+                if weights_size is not None
+            },
+        )
+        return [
+            cost_model.predict(subfolder, weights_size)
+            for subfolder, weights_size in zip(subfolders, weights_sizes)
+        ]
 
-            self.run_benchmark(**benchmark_name)
+    def estimate_shard_cost(
+        self, pinned_num_parameters: Dict[str, float], model: str, **kwargs
+    ) -> float:
+        """
+        Gigabytes of weights of a benchmark, from values that are the same on every
+        machine: the pinned parameter count of the model, or the one in its name
+        """
+        num_parameters = (
+            pinned_num_parameters.get(model)
+            or parse_num_parameters(model)
+            or DEFAULT_NUM_PARAMETERS
+        )
+        bits = get_bits_per_parameter(self.get_weights_config(**kwargs))
+        return num_parameters * bits / 8 / 1e9
+
+    @TRACER.span("shard_benchmarks")
+    def shard_benchmarks(
+        self,
+        benchmarks_to_run: List[Dict[str, Any]],
+        shard_index: int,
+        shard_count: int,
+    ) -> List[Dict[str, Any]]:
+        """
+        Keeps the benchmarks of one shard of the matrix. Shards get about the same
+        estimated cost, the weights size from the parameter count pinned with the model
+        list (see `MODEL_LIST_FILE`) or written in the model's name, never from configs
+        fetched by this machine, so that every machine computes the same split and
+        several machines can share a campaign without coordination
+        """
+        if not 0 <= shard_index < shard_count:
+            raise ValueError(
+                f"Invalid shard {shard_index} of {shard_count}, "
+                "expected 0 <= index < count"
+            )
+        if shard_count == 1:
+            return benchmarks_to_run
 
+        pinned_num_parameters = get_pinned_num_parameters()
+        shards = assign_shards(
+            [
+                self.get_benchmark_subfolder(**benchmark_name)
+                for benchmark_name in benchmarks_to_run
+            ],
+            [
+                self.estimate_shard_cost(pinned_num_parameters, **benchmark_name)
+                for benchmark_name in benchmarks_to_run
+            ],
+            shard_count,
+        )
+        selected = [
+            benchmark_name
+            for benchmark_name, shard in zip(benchmarks_to_run, shards)
+            if shard == shard_index
+        ]
+        self.logger.info(
+            f"Shard {shard_index} of {shard_count}: {len(selected)} of the "
+            f"{len(benchmarks_to_run)} benchmarks"
+        )
+        return selected
+
+    @TRACER.span("order_benchmarks")
+    def order_benchmarks(
+        self, benchmarks_to_run: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """
+        Orders the benchmarks according to `BENCHMARK_ORDER`: as listed, shortest job
+        first, or one benchmark per model first
+        """
+        policy = get_benchmark_order()
+        if policy == PRODUCT_ORDER:
+            return benchmarks_to_run
+
+        durations = self.predict_benchmark_durations(benchmarks_to_run)
+        self.logger.info(
+            f"Ordering {len(benchmarks_to_run)} benchmarks with the {policy} policy, "
+            f"predicted to take {sum(durations) / 3600:.1f}h in total"
+        )
+        return order_benchmarks(benchmarks_to_run, durations, policy)
+
+    @TRACER.span("select_benchmarks_within_budget")
+    def select_benchmarks_within_budget(
+        self, benchmarks_to_run: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """
+        Picks the benchmarks left to conduct that are predicted to complete before the
+        deadline, shortest first, to complete as many benchmarks as possible
+        """
+        benchmarks_left = [
+            benchmark_name
+            for benchmark_name in benchmarks_to_run
+            if not self.is_benchmark_conducted(
+                self.push_repo_id, self.get_benchmark_subfolder(**benchmark_name)
+            )
+        ]
+        # benchmarks that are skipped without running do not take any of the budget,
+        # the ones that do not fit in memory are still picked to push their skip report
+        scenario_config = self.get_scenario_config()
+        benchmarks_left = [
+            benchmark_name
+            for benchmark_name in benchmarks_left
+            if self.is_benchmark_supported(**benchmark_name)
+        ]
+        memory_skipped = [
+            benchmark_name
+            for benchmark_name in benchmarks_left
+            if self.check_memory(scenario_config, **benchmark_name) is not None
+        ]
+        benchmarks_left = [
+            benchmark_name
+            for benchmark_name in benchmarks_left
+            if benchmark_name not in memory_skipped
+        ]
+        durations = self.predict_benchmark_durations(benchmarks_left)
+        self.predicted_durations = {
+            self.get_benchmark_subfolder(**benchmark_name): duration
+            for benchmark_name, duration in zip(benchmarks_left, durations)
+        }
+
+        num_slots = max(1, len(self.get_execution_slots()))
+        time_budget = self.get_remaining_time() - UPLOAD_FLUSH_MARGIN
+        selected = select_within_budget(
+            benchmarks_left, durations, time_budget, num_slots
+        )
+        self.logger.info(
+            f"Picked {len(selected)} of the {len(benchmarks_left)} benchmarks left, "
+            f"predicted to complete within {time_budget / 3600:.1f}h on {num_slots} slots"
+            f", and {len(memory_skipped)} that do not fit in memory"
+        )
+        return memory_skipped + selected
+
+    def get_remaining_time(self) -> float:
+        return self.deadline - time.monotonic() if self.deadline is not None else 0.0
+
+    def has_time_for(self, subfolder: str) -> bool:
+        """
+        Whether a benchmark is predicted to complete, and its uploads to be flushed,
+        before the deadline. Always True without a time budget. The work queue key of a
+        group (see `get_work_item_key`) needs the time of all its benchmarks, which run
+        one after the other
+        """
+        if self.deadline is None:
+            return True
+        duration = sum(
+            self.predicted_durations.get(member, 0.0) for member in subfolder.split("+")
+        )
+        return duration + UPLOAD_FLUSH_MARGIN <= self.get_remaining_time()
+
+    @TRACER.span("load_run_journal")
+    def load_run_journal(self, reconcile: bool = False):
+        """
+        Opens the run journal of the push repo, requeuing the benchmarks interrupted by
+        a previous run, and reconciles it with the push repo if asked or if it is empty
+        """
+        self.journal = RunJournal.for_repo(self.push_repo_id)
+        requeued = self.journal.requeue_interrupted()
+        if requeued:
+            self.logger.info(
+                f"Requeued {requeued} benchmarks interrupted by a previous run"
+            )
+
+        if reconcile or len(self.journal) == 0:
+            self.load_completion_index()
+            if self.completion_index is not None:
+                self.journal.import_completion_index(self.completion_index)
+        self.logger.info(
+            f"Loaded run journal {self.journal.path}: {self.journal.count_by_state()}"
+        )
+
+    def on_artifacts_pushed(self, paths: List[str]):
+        """
+        Marks the benchmarks whose `benchmark.json` was uploaded as pushed in the journal
+        """
+        if self.journal is None:
+            return
+        suffix = f"/{Benchmark.default_filename}"
+        self.journal.mark_pushed(
+            path[: -len(suffix)] for path in paths if path.endswith(suffix)
+        )
+
+    def load_completion_index(self):
+        """
+        Builds the completion index of the push repo in a single listing, falling back
+        to querying each report individually if the repo cannot be listed
+        """
+        try:
+            self.completion_index = BenchmarkCompletionIndex.from_repo(
+                self.push_repo_id
+            )
+            self.logger.info(
+                f"Loaded completion index with {len(self.completion_index)} reports from {self.push_repo_id}"
+            )
+        except Exception as e:
+            self.logger.warning(
+                f"Could not build the completion index of {self.push_repo_id}, "
+                f"falling back to per-benchmark queries, error:\n{e}"
+            )
+            self.completion_index = None
+
+    @TRACER.span("is_benchmark_conducted")
     def is_benchmark_conducted(self, push_repo_id, subfolder):
+        if push_repo_id == self.push_repo_id:
+            if self.journal is not None and subfolder in self.journal:
+                return self.journal.is_conducted(subfolder)
+            if self.completion_index is not None:
+                return self.completion_index.is_conducted(subfolder)
+            if self.journal is not None:
+                # without reconciliation, the journal knows every benchmark conducted
+                return False
+
         try:
             report = BenchmarkReport.from_pretrained(
                 repo_id=push_repo_id, subfolder=subfolder
             )
-            if "traceback" in report.to_dict():
-                return False
-            else:
-                return True
+            return is_complete(report.to_dict())
         except Exception:
             return False
 
+    @TRACER.span("push_artifact")
+    def push_artifact(self, artifact, subfolder: str):
+        """
+        Queues a benchmark config, report or benchmark for upload, or pushes it right away
+        when no uploader is running
+        """
+        if self.uploader is not None:
+            self.uploader.add(artifact, subfolder)
+        else:
+            artifact.push_to_hub(
+                repo_id=self.push_repo_id, subfolder=subfolder, private=True
+            )
+            self.on_artifacts_pushed([f"{subfolder}/{artifact.default_filename}"])
+
+    def update_completion_index(
+        self, subfolder: str, benchmark_report: BenchmarkReport
+    ):
+        if self.completion_index is not None:
+            self.completion_index.update(subfolder, benchmark_report.to_dict())
+
     @abstractmethod
     def get_benchmark_name(self, model: str, **kwargs) -> str:
         raise NotImplementedError(
@@ -109,28 +714,213 @@ class LLMPerfBenchmarkManager(ABC):
         )
 
     def run_benchmark(self, **kwargs):
-        model = kwargs.pop("model")
+        prepared_benchmark = self.prepare_benchmark(**kwargs)
+        if prepared_benchmark is not None:
+            self.execute_and_log_benchmark(*prepared_benchmark)
+
+    def run_benchmark_group(self, benchmark_group: List[Dict[str, Any]]):
+        """
+        Runs the benchmarks of a group in a single process, each with its own report
+        and subfolder. Benchmarks that did not run or failed for a non deterministic
+        reason are run again on their own
+        """
+        prepared_benchmarks = [
+            prepared_benchmark
+            for prepared_benchmark in (
+                self.prepare_benchmark(**benchmark_name)
+                for benchmark_name in benchmark_group
+            )
+            if prepared_benchmark is not None
+        ]
+        if len(prepared_benchmarks) <= 1:
+            for prepared_benchmark in prepared_benchmarks:
+                self.execute_and_log_benchmark(*prepared_benchmark)
+            return
 
+        benchmark_configs = [config for config, _ in prepared_benchmarks]
+        self.logger.info(
+            f"Running {len(benchmark_configs)} benchmarks with model "
+            f"{benchmark_configs[0].backend.model} in a single process: "
+            f"{[config.name for config in benchmark_configs]}"
+        )
+        try:
+            results = self.launch_benchmark_group(benchmark_configs)
+        except Exception as e:
+            self.logger.error(
+                f"Benchmark group failed, running it benchmark by benchmark, error:\n{e}"
+            )
+            results = []
+
+        for index, (benchmark_config, subfolder) in enumerate(prepared_benchmarks):
+            result = results[index] if index < len(results) else None
+            if result is not None and "report" in result:
+                benchmark_report = BenchmarkReport.from_dict(result["report"])
+                self.log_benchmark_success(
+                    benchmark_config, subfolder, benchmark_report
+                )
+            elif (
+                result is not None
+                and classify_failure(result["traceback"]) == DETERMINISTIC
+            ):
+                self.log_benchmark_failure(
+                    benchmark_config, subfolder, result["traceback"]
+                )
+            else:
+                self.execute_and_log_benchmark(benchmark_config, subfolder)
+
+    def run_shape_sweep(self, **kwargs):
+        """
+        Runs a benchmark at every sequence length and batch size of the sweep, looking
+        for the largest batch size that fits by bisection once one runs out of memory.
+        Every point is pushed as its own benchmark, in a subfolder suffixed with its
+        shape. The largest batch size that fits at a sequence length is pushed as a
+        report of its own, see `log_max_batch_size`
+        """
+        model = kwargs["model"]
+        for sequence_length in get_sweep_sequence_lengths():
+            # a point that failed for another reason, or was not run, ends the search
+            # early, its result is then only a lower bound that is not recorded
+            inconclusive = False
+
+            def fits(batch_size: int) -> Optional[bool]:
+                nonlocal inconclusive
+                input_shapes = {
+                    "batch_size": batch_size,
+                    "sequence_length": sequence_length,
+                }
+                subfolder = self.get_benchmark_subfolder(
+                    input_shapes=input_shapes, **kwargs
+                )
+                if self.is_benchmark_conducted(self.push_repo_id, subfolder):
+                    return True
+
+                prepared_benchmark = self.prepare_benchmark(
+                    input_shapes=input_shapes, **kwargs
+                )
+                if prepared_benchmark is None:
+                    # a predicted out of memory narrows the search like an actual one
+                    if subfolder in self.memory_skipped:
+                        return False
+                    inconclusive = True
+                    return None
+
+                # running out of memory is the expected outcome here, not worth a retry
+                report = self.execute_and_log_benchmark(
+                    *prepared_benchmark, max_retries=0
+                ).to_dict()
+                if "traceback" not in report:
+                    return True
+                if is_out_of_memory(report["traceback"]):
+                    return False
+                inconclusive = True
+                return None
+
+            max_batch_size = find_max_batch_size(get_sweep_batch_sizes(), fits)
+            self.logger.info(
+                f"Largest batch size that fits for model {model} with "
+                f"{self.get_benchmark_name(**kwargs)} at sequence length {sequence_length}: {max_batch_size}"
+            )
+            if not inconclusive:
+                self.log_max_batch_size(sequence_length, max_batch_size, **kwargs)
+
+    def log_max_batch_size(
+        self, sequence_length: int, max_batch_size: int, model: str, **kwargs
+    ):
+        """
+        Pushes the largest batch size that fits at a sequence length, as a report with
+        only a `max_batch_size`, next to the config of the benchmark at that batch size
+        and in a subfolder suffixed with the sequence length alone. It becomes the
+        `max_batch_size` of the model and config in the leaderboard table
+        """
         benchmark_name = self.get_benchmark_name(model, **kwargs)
-        subfolder = f"{benchmark_name}/{model.replace('/', '--')}"
+        subfolder = f"{benchmark_name}-sl{sequence_length}/{model.replace('/', '--')}"
+        if self.is_benchmark_conducted(self.push_repo_id, subfolder):
+            return
+
+        benchmark_config = self.get_benchmark_config(model, **kwargs)
+        benchmark_config.scenario.input_shapes = {
+            **benchmark_config.scenario.input_shapes,
+            "batch_size": max_batch_size,
+            "sequence_length": sequence_length,
+        }
+        benchmark_report = BenchmarkReport.from_dict({"max_batch_size": max_batch_size})
+        self.push_artifact(benchmark_config, subfolder)
+        self.push_artifact(benchmark_report, subfolder)
+        self.update_completion_index(subfolder, benchmark_report)
+        benchmark = Benchmark(config=benchmark_config, report=benchmark_report)
+        self.push_artifact(benchmark, subfolder)
+
+    def get_benchmark_subfolder(
+        self, model: str, input_shapes: Optional[Dict[str, int]] = None, **kwargs
+    ) -> str:
+        benchmark_name = self.get_benchmark_name(model, **kwargs)
+        if input_shapes is not None:
+            benchmark_name += (
+                f"-bs{input_shapes['batch_size']}-sl{input_shapes['sequence_length']}"
+            )
+        return f"{benchmark_name}/{model.replace('/', '--')}"
+
+    def prepare_benchmark(self, **kwargs) -> Optional[Tuple[BenchmarkConfig, str]]:
+        """
+        Checks whether a benchmark should run, and if so builds and pushes its config.
+        Returns the config and subfolder of the benchmark, or None if it is skipped.
+        An `input_shapes` kwarg overrides the input shapes of the scenario
+        """
+        model = kwargs.pop("model")
+        input_shapes = kwargs.pop("input_shapes", None)
+
+        subfolder = self.get_benchmark_subfolder(model, input_shapes, **kwargs)
+        benchmark_name = subfolder.split("/")[0]
+        # the points of a shape sweep are predicted to take as long as the benchmark
+        base_subfolder = self.get_benchmark_subfolder(model, **kwargs)
 
         if not self.is_benchmark_supported(**kwargs):
             self.logger.info(
                 f"Skipping benchmark {benchmark_name} with model {model} since it is not supported"
             )
-            return
+            return None
 
         if self.is_benchmark_conducted(self.push_repo_id, subfolder):
             self.logger.info(
                 f"Skipping benchmark {benchmark_name} with model {model} since it was already conducted"
             )
-            return
+            return None
 
-        benchmark_config = self.get_benchmark_config(model, **kwargs)
-        benchmark_config.push_to_hub(
-            repo_id=self.push_repo_id, subfolder=subfolder, private=True
-        )
-        self.execute_and_log_benchmark(benchmark_config, subfolder)
+        if not self.has_time_for(base_subfolder):
+            self.logger.info(
+                f"Skipping benchmark {benchmark_name} with model {model} since it would not complete within the time budget"
+            )
+            return None
+
+        with TRACER.span("get_benchmark_config"):
+            benchmark_config = self.get_benchmark_config(model, **kwargs)
+        if input_shapes is not None:
+            benchmark_config.scenario.input_shapes = {
+                **benchmark_config.scenario.input_shapes,
+                **input_shapes,
+            }
+
+        memory_skip = self.check_memory(benchmark_config.scenario, model, **kwargs)
+        if memory_skip is not None:
+            self.logger.info(
+                f"Skipping benchmark {benchmark_name} with model {model} since it would not fit in memory: {memory_skip['skipped']}"
+            )
+            self.log_benchmark_skipped(benchmark_config, subfolder, memory_skip)
+            self.memory_skipped.add(subfolder)
+            return None
+
+        skip_reason = self.get_skip_reason(benchmark_config, subfolder)
+        if skip_reason is not None:
+            self.logger.info(
+                f"Skipping benchmark {benchmark_name} with model {model} since it is known to fail: {skip_reason}"
+            )
+            return None
+
+        self.apply_execution_slot(benchmark_config)
+        self.push_artifact(benchmark_config, subfolder)
+        if self.journal is not None:
+            self.journal.start(subfolder)
+        return benchmark_config, subfolder
 
     @abstractmethod
     def get_benchmark_config(self, model: str, **kwargs) -> BenchmarkConfig:
@@ -138,32 +928,290 @@ class LLMPerfBenchmarkManager(ABC):
             "This method should be implemented in the child class"
         )
 
-    def execute_and_log_benchmark(
+    def get_memory_capacity(self) -> Optional[float]:
+        """
+        Gigabytes of memory of the machine, from `MACHINE_MEMORY` or from the machine's
+        entry in `hardware.yaml`, None if it is not known
+        """
+        if get_machine_memory() is not None:
+            return get_machine_memory()
+        if self.machine is None:
+            return None
+        hardware_config = get_hardware_config(self.machine)
+        return hardware_config.memory if hardware_config is not None else None
+
+    def estimate_memory_footprint(
+        self, scenario_config: InferenceConfig, model: str, **kwargs
+    ) -> Optional[MemoryEstimate]:
+        """
+        Peak memory of a benchmark, from the model's config, the benchmark's dtype or
+        quantization and its input shapes, None if the model's config is not available.
+        Can be overridden by child classes whose backend needs more (e.g. to export)
+        """
+        model_config = self.get_model_config(model)
+        if model_config is None:
+            return None
+        input_shapes = {**INPUT_SHAPES, **scenario_config.input_shapes}
+        return estimate_memory(
+            model_config,
+            self.get_weights_config(**kwargs),
+            batch_size=input_shapes["batch_size"],
+            sequence_length=input_shapes["sequence_length"],
+            max_new_tokens=scenario_config.generate_kwargs.get("max_new_tokens", 0),
+        )
+
+    def check_memory(
+        self, scenario_config: InferenceConfig, model: str, **kwargs
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Returns the skipped report of a benchmark that is not expected to fit in the
+        memory of the machine, or None if it should run
+        """
+        if self.memory_capacity is None:
+            return None
+        capacity = self.memory_capacity
+        if self.device == "cpu" and self.scheduler is not None:
+            # the RAM is shared by the benchmarks running concurrently
+            capacity /= len(self.scheduler.slots)
+
+        estimate = self.estimate_memory_footprint(scenario_config, model, **kwargs)
+        if estimate is None or fits_in_memory(estimate, capacity):
+            return None
+        return {
+            "skipped": (
+                f"estimated peak memory of {estimate.total:.1f}GB (weights "
+                f"{estimate.weights:.1f}GB, KV cache {estimate.kv_cache:.1f}GB) does "
+                f"not fit in the {capacity:.0f}GB available on {self.machine}"
+            ),
+            "estimated_memory": estimate.total,
+            "estimated_weights_memory": estimate.weights,
+            "estimated_kv_cache_memory": estimate.kv_cache,
+            "memory_capacity": capacity,
+        }
+
+    def get_skip_reason(
         self, benchmark_config: BenchmarkConfig, subfolder: str
-    ):
+    ) -> Optional[str]:
+        """
+        Returns why the benchmark is expected to fail deterministically, learning from
+        the traceback pushed by a previous run if any, or None if it should run
+        """
+        if self.skip_list is None:
+            return None
+
+        stored_traceback = self.get_stored_traceback(subfolder)
+        if (
+            self.skip_list.get_reason(benchmark_config) is None
+            and stored_traceback is not None
+            and classify_failure(stored_traceback) == DETERMINISTIC
+        ):
+            stored_config = self.load_pushed_config(subfolder)
+            if stored_config is not None:
+                self.skip_list.add(
+                    benchmark_config,
+                    stored_traceback,
+                    environment=stored_config.get("environment", {}),
+                )
+
+        return self.skip_list.get_reason(benchmark_config)
+
+    def get_stored_traceback(self, subfolder: str) -> Optional[str]:
+        if self.journal is not None and self.journal.get_error(subfolder) is not None:
+            return self.journal.get_error(subfolder)
+        if self.completion_index is not None:
+            return self.completion_index.get_traceback(subfolder)
+        return None
+
+    def load_pushed_config(self, subfolder: str) -> Optional[Dict[str, Any]]:
+        """
+        Reads the benchmark config pushed by a previous run, None if it is not available
+        """
+        filename = f"{subfolder}/{BenchmarkConfig.default_filename}"
+        if os.path.isdir(self.push_repo_id):
+            return read_json(os.path.join(self.push_repo_id, filename))
+
         try:
-            self.logger.info(
-                f"Running benchmark {benchmark_config.name} with model {benchmark_config.backend.model}"
+            return read_json(
+                hf_hub_download(
+                    repo_id=self.push_repo_id, repo_type="dataset", filename=filename
+                )
             )
-            benchmark_report = Benchmark.launch(benchmark_config)
-            benchmark_report.push_to_hub(
-                repo_id=self.push_repo_id, subfolder=subfolder, private=True
-            )
-            benchmark = Benchmark(config=benchmark_config, report=benchmark_report)
-            benchmark.push_to_hub(
-                repo_id=self.push_repo_id, subfolder=subfolder, private=True
-            )
-        except Exception as e:
-            self.logger.error(
-                f"Benchmark {benchmark_config.name} failed with model {benchmark_config.backend.model}, error:\n{e}"
-            )
-            benchmark_report = BenchmarkReport.from_dict(
-                {"traceback": traceback.format_exc()}
-            )
-            benchmark_report.push_to_hub(
-                repo_id=self.push_repo_id, subfolder=subfolder, private=True
+        except Exception:
+            return None
+
+    def get_scenario_config(self) -> InferenceConfig:
+        """
+        Scenario shared by all the benchmarks: a fixed sampling budget, or with
+        `ADAPTIVE_SAMPLING=1` sampling until the latencies are precise enough
+        """
+        if is_adaptive_sampling():
+            return AdaptiveInferenceConfig(
+                memory=True,
+                energy=True,
+                latency=True,
+                duration=2,
+                iterations=5,
+                max_duration=30,
+                warmup_runs=20,
+                input_shapes=INPUT_SHAPES,
+                generate_kwargs=GENERATE_KWARGS,
             )
-            benchmark = Benchmark(config=benchmark_config, report=benchmark_report)
-            benchmark.push_to_hub(
-                repo_id=self.push_repo_id, subfolder=subfolder, private=True
+
+        return InferenceConfig(
+            memory=True,
+            energy=True,
+            latency=True,
+            duration=10,
+            iterations=10,
+            warmup_runs=10,
+            input_shapes=INPUT_SHAPES,
+            generate_kwargs=GENERATE_KWARGS,
+        )
+
+    def get_launcher_config(self, **kwargs) -> ProcessConfig:
+        """
+        Launcher of the benchmarks: a freshly spawned process per benchmark, or with
+        `WARM_WORKERS=1` a process forked from a server that preloaded the libraries
+        """
+        if is_warm_workers():
+            return WarmProcessConfig(
+                preload=get_preload_modules(self.backend), **kwargs
             )
+        return ProcessConfig(**kwargs)
+
+    def apply_execution_slot(self, benchmark_config: BenchmarkConfig):
+        """
+        Pins the benchmark to the execution slot held by the current thread, if any,
+        and records the slot in the benchmark's environment
+        """
+        slot = self.current_slot
+        if slot is None:
+            return
+
+        benchmark_config.environment["execution_slots"] = len(self.scheduler.slots)
+        if slot.cpus is not None:
+            benchmark_config.backend.intra_op_num_threads = len(slot.cpus)
+            benchmark_config.environment["cpu_affinity"] = format_cpu_list(slot.cpus)
+            benchmark_config.environment["numa_node"] = slot.numa_node
+
+    @property
+    def current_slot(self) -> Optional[ExecutionSlot]:
+        return self.scheduler.current_slot if self.scheduler is not None else None
+
+    @TRACER.span("launch_benchmark")
+    def launch_benchmark(self, benchmark_config: BenchmarkConfig) -> BenchmarkReport:
+        if self.current_slot is not None:
+            return self.scheduler.launch(benchmark_config)
+        return Benchmark.launch(benchmark_config)
+
+    @TRACER.span("launch_benchmark_group")
+    def launch_benchmark_group(
+        self, benchmark_configs: List[BenchmarkConfig]
+    ) -> List[Dict[str, Any]]:
+        if self.current_slot is not None:
+            return self.scheduler.launch_group(benchmark_configs)
+        return launch_benchmark_group(benchmark_configs)
+
+    @TRACER.span("log_benchmark")
+    def log_benchmark_success(
+        self,
+        benchmark_config: BenchmarkConfig,
+        subfolder: str,
+        benchmark_report: BenchmarkReport,
+    ):
+        record_achieved_precision(benchmark_config, benchmark_report)
+        self.push_artifact(benchmark_report, subfolder)
+        self.update_completion_index(subfolder, benchmark_report)
+        if self.journal is not None:
+            self.journal.finish(subfolder)
+        benchmark = Benchmark(config=benchmark_config, report=benchmark_report)
+        self.push_artifact(benchmark, subfolder)
+
+    @TRACER.span("log_benchmark")
+    def log_benchmark_failure(
+        self, benchmark_config: BenchmarkConfig, subfolder: str, error_traceback: str
+    ) -> BenchmarkReport:
+        if (
+            self.skip_list is not None
+            and classify_failure(error_traceback) == DETERMINISTIC
+        ):
+            self.skip_list.add(benchmark_config, error_traceback)
+        benchmark_report = BenchmarkReport.from_dict({"traceback": error_traceback})
+        self.push_artifact(benchmark_report, subfolder)
+        self.update_completion_index(subfolder, benchmark_report)
+        if self.journal is not None:
+            self.journal.finish(subfolder, error=error_traceback)
+        benchmark = Benchmark(config=benchmark_config, report=benchmark_report)
+        self.push_artifact(benchmark, subfolder)
+        return benchmark_report
+
+    def log_benchmark_skipped(
+        self,
+        benchmark_config: BenchmarkConfig,
+        subfolder: str,
+        skip_report: Dict[str, Any],
+    ):
+        """
+        Pushes the config and the skipped report of a benchmark that was not launched,
+        unless a previous run already recorded it
+        """
+        if self.journal is not None:
+            if self.journal.get_state(subfolder) == SKIPPED:
+                return
+        elif (
+            self.completion_index is not None
+            and self.completion_index.get_skip_reason(subfolder) is not None
+        ):
+            return
+
+        benchmark_report = BenchmarkReport.from_dict(skip_report)
+        self.push_artifact(benchmark_config, subfolder)
+        self.push_artifact(benchmark_report, subfolder)
+        self.update_completion_index(subfolder, benchmark_report)
+        if self.journal is not None:
+            self.journal.skip(subfolder)
+        benchmark = Benchmark(config=benchmark_config, report=benchmark_report)
+        self.push_artifact(benchmark, subfolder)
+
+    def execute_and_log_benchmark(
+        self,
+        benchmark_config: BenchmarkConfig,
+        subfolder: str,
+        max_retries: Optional[int] = None,
+    ) -> BenchmarkReport:
+        """
+        Runs a benchmark, retrying transient failures, and pushes its report.
+        Returns the report, which holds a traceback if the benchmark failed
+        """
+        if max_retries is None:
+            max_retries = get_transient_failure_retries()
+        for attempt in range(max_retries + 1):
+            try:
+                self.logger.info(
+                    f"Running benchmark {benchmark_config.name} with model {benchmark_config.backend.model}"
+                )
+                benchmark_report = self.launch_benchmark(benchmark_config)
+                self.log_benchmark_success(
+                    benchmark_config, subfolder, benchmark_report
+                )
+                return benchmark_report
+            except Exception as e:
+                error_traceback = traceback.format_exc()
+                failure = classify_failure(error_traceback)
+                self.logger.error(
+                    f"Benchmark {benchmark_config.name} failed ({failure}) with model {benchmark_config.backend.model}, error:\n{e}"
+                )
+                if (
+                    failure != DETERMINISTIC
+                    and attempt < max_retries
+                    and self.has_time_for(subfolder)
+                ):
+                    self.logger.info(
+                        f"Retrying benchmark {benchmark_config.name} with model {benchmark_config.backend.model} "
+                        f"({attempt + 1}/{max_retries})"
+                    )
+                    continue
+
+                return self.log_benchmark_failure(
+                    benchmark_config, subfolder, error_traceback
+                )
@@ -0,0 +1,111 @@
+import json
+import os
+import tempfile
+import threading
+import time
+from logging import getLogger
+from typing import Any, Callable, Optional
+
+from llm_perf.common.dependency import (
+    get_cache_dir,
+    get_model_list_cache_ttl,
+    is_offline_mode,
+)
+
+LOGGER = getLogger("llm-perf-backend")
+
+# names of the entries that are being revalidated in the background
+_REVALIDATING = set()
+_REVALIDATING_LOCK = threading.Lock()
+
+
+def _cache_path(name: str) -> str:
+    return os.path.join(get_cache_dir(), f"{name}.json")
+
+
+def read_json(path: str) -> Optional[Any]:
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def write_json(path: str, data: Any) -> None:
+    """
+    Writes a JSON file atomically, so that concurrent readers never see a partial file.
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(data, f, indent=2)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def _refresh(name: str, fetch: Callable[[], Any]) -> Any:
+    value = fetch()
+    write_json(_cache_path(name), {"fetched_at": time.time(), "value": value})
+    return value
+
+
+def _revalidate_in_background(name: str, fetch: Callable[[], Any]) -> None:
+    with _REVALIDATING_LOCK:
+        if name in _REVALIDATING:
+            return
+        _REVALIDATING.add(name)
+
+    def revalidate():
+        try:
+            _refresh(name, fetch)
+            LOGGER.info(f"Revalidated cached {name}")
+        except Exception as e:
+            LOGGER.warning(f"Could not revalidate cached {name}, error:\n{e}")
+        finally:
+            with _REVALIDATING_LOCK:
+                _REVALIDATING.discard(name)
+
+    threading.Thread(target=revalidate, name=f"revalidate-{name}", daemon=True).start()
+
+
+def get_cached_value(
+    name: str, fetch: Callable[[], Any], ttl: Optional[float] = None
+) -> Any:
+    """
+    Returns a JSON-serializable value from the on-disk cache, fetching it when needed.
+
+    - a fresh entry (younger than `ttl` seconds) is returned as is.
+    - a stale entry is returned right away and refreshed in a background thread.
+    - a missing entry is fetched synchronously, and fetch errors are raised instead of
+      being turned into an empty value.
+    - in offline mode the cached entry is returned whatever its age, and a missing
+      entry is an error.
+
+    Args:
+        name (str): Name of the cache entry.
+        fetch (Callable[[], Any]): Fetches the value from its source, raises on failure.
+        ttl (float, optional): Time to live of the entry in seconds, defaults to `MODEL_LIST_CACHE_TTL`.
+
+    Returns:
+        Any: The cached or fetched value.
+    """
+    ttl = get_model_list_cache_ttl() if ttl is None else ttl
+    entry = read_json(_cache_path(name))
+
+    if is_offline_mode():
+        if entry is None:
+            raise RuntimeError(
+                f"Offline mode is enabled but {name} is not cached in {get_cache_dir()}"
+            )
+        return entry["value"]
+
+    if entry is None:
+        return _refresh(name, fetch)
+
+    if time.time() - entry["fetched_at"] > ttl:
+        _revalidate_in_background(name, fetch)
+
+    return entry["value"]
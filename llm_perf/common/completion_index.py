@@ -0,0 +1,143 @@
+import json
+import os
+from glob import glob
+from logging import getLogger
+from typing import Dict, Optional
+
+from huggingface_hub import snapshot_download
+from huggingface_hub.utils import RepositoryNotFoundError
+
+REPO_TYPE = "dataset"
+REPORT_FILENAME = "benchmark_report.json"
+
+LOGGER = getLogger("llm-perf-backend")
+
+
+def is_complete(report: Dict) -> bool:
+    """
+    Whether a report holds measurements, rather than the traceback of a failure or the
+    reason a benchmark was skipped before launch.
+    """
+    return "traceback" not in report and "skipped" not in report
+
+
+class BenchmarkCompletionIndex:
+    """
+    Index of the benchmark subfolders of a push repo that already hold a report.
+
+    The index is built once per run from a single snapshot of the small
+    `benchmark_report.json` files of the repo (or from a local directory laid out
+    the same way) and is then queried in O(1) per benchmark, instead of downloading
+    and parsing one report from the Hub for every benchmark.
+    """
+
+    def __init__(
+        self,
+        statuses: Optional[Dict[str, bool]] = None,
+        tracebacks: Optional[Dict[str, str]] = None,
+        skip_reasons: Optional[Dict[str, str]] = None,
+    ):
+        # maps a subfolder to True if its report is complete, False if it holds a traceback
+        # or records a skipped benchmark
+        self.statuses = dict(statuses or {})
+        # maps the subfolders of failed benchmarks to their traceback
+        self.tracebacks = dict(tracebacks or {})
+        # maps the subfolders of benchmarks skipped before launch to the reason
+        self.skip_reasons = dict(skip_reasons or {})
+
+    @classmethod
+    def from_directory(cls, directory: str) -> "BenchmarkCompletionIndex":
+        """
+        Builds the index from a local directory mirroring the layout of the push repo.
+
+        Args:
+            directory (str): Root of the local copy of the repo.
+
+        Returns:
+            BenchmarkCompletionIndex: The index of all the reports found in the directory.
+        """
+        statuses, tracebacks, skip_reasons = {}, {}, {}
+        for file in glob(
+            os.path.join(directory, "**", REPORT_FILENAME), recursive=True
+        ):
+            subfolder = os.path.relpath(os.path.dirname(file), directory)
+            try:
+                with open(file, "r") as f:
+                    report = json.load(f)
+            except (OSError, ValueError):
+                # an unreadable report is treated as a benchmark that was not conducted
+                continue
+            subfolder = subfolder.replace(os.sep, "/")
+            statuses[subfolder] = is_complete(report)
+            if "traceback" in report:
+                tracebacks[subfolder] = report["traceback"]
+            if "skipped" in report:
+                skip_reasons[subfolder] = report["skipped"]
+
+        return cls(statuses, tracebacks, skip_reasons)
+
+    @classmethod
+    def from_hub(cls, repo_id: str) -> "BenchmarkCompletionIndex":
+        """
+        Builds the index from a snapshot of the reports of a Hub repo.
+
+        Only files that changed since the last snapshot are downloaded, the rest is
+        served from the local Hugging Face cache.
+
+        Args:
+            repo_id (str): The push repo of the benchmarks.
+
+        Returns:
+            BenchmarkCompletionIndex: The index of all the reports pushed to the repo.
+        """
+        try:
+            snapshot = snapshot_download(
+                repo_type=REPO_TYPE,
+                repo_id=repo_id,
+                allow_patterns=[f"**/{REPORT_FILENAME}"],
+            )
+        except RepositoryNotFoundError:
+            LOGGER.info(
+                f"Repo {repo_id} does not exist yet, starting from an empty index"
+            )
+            return cls()
+
+        return cls.from_directory(snapshot)
+
+    @classmethod
+    def from_repo(cls, repo_id: str) -> "BenchmarkCompletionIndex":
+        """
+        Builds the index from `repo_id`, which is either a Hub repo id or a local directory.
+        """
+        if os.path.isdir(repo_id):
+            return cls.from_directory(repo_id)
+        return cls.from_hub(repo_id)
+
+    def is_conducted(self, subfolder: str) -> bool:
+        return self.statuses.get(subfolder, False)
+
+    def get_traceback(self, subfolder: str) -> Optional[str]:
+        return self.tracebacks.get(subfolder)
+
+    def get_skip_reason(self, subfolder: str) -> Optional[str]:
+        return self.skip_reasons.get(subfolder)
+
+    def update(self, subfolder: str, report: Dict) -> None:
+        """
+        Records a report that was just pushed so that the index stays up to date.
+        """
+        self.statuses[subfolder] = is_complete(report)
+        if "traceback" in report:
+            self.tracebacks[subfolder] = report["traceback"]
+        else:
+            self.tracebacks.pop(subfolder, None)
+        if "skipped" in report:
+            self.skip_reasons[subfolder] = report["skipped"]
+        else:
+            self.skip_reasons.pop(subfolder, None)
+
+    def __contains__(self, subfolder: str) -> bool:
+        return subfolder in self.statuses
+
+    def __len__(self) -> int:
+        return len(self.statuses)
@@ -0,0 +1,303 @@
+import hashlib
+import heapq
+import os
+import re
+from logging import getLogger
+from statistics import median
+from typing import Any, Dict, List, Optional
+
+from huggingface_hub import hf_hub_download
+
+from llm_perf.common.cache import read_json
+from llm_perf.common.dependency import is_offline_mode
+
+LOGGER = getLogger("llm-perf-backend")
+
+PRODUCT_ORDER = "product"
+SHORTEST_JOB_FIRST = "sjf"
+MODEL_FIRST = "model-first"
+ORDERING_POLICIES = [PRODUCT_ORDER, SHORTEST_JOB_FIRST, MODEL_FIRST]
+
+BITS_PER_DTYPE = {
+    "float64": 64,
+    "float32": 32,
+    "float16": 16,
+    "bfloat16": 16,
+    "float8": 8,
+    "int8": 8,
+}
+DEFAULT_BITS = 32
+
+# parameters of a model whose size is neither pinned nor written in its name
+DEFAULT_NUM_PARAMETERS = 1e9
+# a size in the name of a model, e.g. the 7B of Mistral-7B-v0.1, the 560m of
+# bloomz-560m or the 8x7B (experts x size) of Mixtral-8x7B-v0.1
+NAME_SIZE_PATTERN = re.compile(
+    r"(?<![\w.])(?:(\d+)x)?(\d+(?:\.\d+)?)([bBmM])(?![a-zA-Z])"
+)
+
+# seconds per (1 + gigabytes of weights) until earlier runs calibrate it, the 1 stands
+# for the fixed cost of starting a process and warming up
+DEFAULT_SECONDS_PER_UNIT = 60.0
+
+
+def first_config_value(config: Dict[str, Any], *keys: str) -> Optional[Any]:
+    """
+    Returns the value of the first of `keys` set in a model config, architectures
+    naming the same size differently (e.g. `hidden_size`, `n_embd` or `d_model`).
+    """
+    for key in keys:
+        if config.get(key) is not None:
+            return config[key]
+    return None
+
+
+def estimate_num_parameters(model_config: Dict[str, Any]) -> Optional[float]:
+    """
+    Estimates the number of parameters of a decoder from its `config.json`, from the
+    sizes of its embeddings, attention and (possibly gated or mixture of experts) MLPs.
+    Returns None if the config does not describe the architecture's sizes.
+    """
+    model_config = {**model_config, **(model_config.get("text_config") or {})}
+    hidden_size = first_config_value(model_config, "hidden_size", "n_embd", "d_model")
+    num_layers = first_config_value(
+        model_config, "num_hidden_layers", "n_layer", "num_layers"
+    )
+    vocab_size = first_config_value(model_config, "vocab_size")
+    if hidden_size is None or num_layers is None:
+        return None
+
+    num_heads = first_config_value(model_config, "num_attention_heads", "n_head") or 1
+    num_kv_heads = first_config_value(model_config, "num_key_value_heads") or num_heads
+    head_dim = first_config_value(model_config, "head_dim") or hidden_size // num_heads
+    intermediate_size = first_config_value(
+        model_config, "intermediate_size", "n_inner", "ffn_dim"
+    )
+    num_experts = (
+        first_config_value(model_config, "num_local_experts", "num_experts") or 1
+    )
+
+    attention = hidden_size * head_dim * (2 * num_heads + 2 * num_kv_heads)
+    if intermediate_size is None:
+        mlp = 8 * hidden_size * hidden_size
+    else:
+        # gated MLPs (llama, mistral, ...) have a third projection
+        is_gated = model_config.get("hidden_act") in ("silu", "swiglu", "geglu")
+        mlp = (3 if is_gated else 2) * hidden_size * intermediate_size
+    embeddings = (vocab_size or 0) * hidden_size
+    if not model_config.get("tie_word_embeddings", True):
+        embeddings *= 2
+
+    return float(embeddings + num_layers * (attention + num_experts * mlp))
+
+
+def parse_num_parameters(model: str) -> Optional[float]:
+    """
+    Number of parameters written in the name of a model, e.g. 7e9 for
+    mistralai/Mistral-7B-v0.1, None if the name does not tell it.
+    """
+    match = NAME_SIZE_PATTERN.search(model.split("/")[-1])
+    if match is None:
+        return None
+    num_experts, size, unit = match.groups()
+    return int(num_experts or 1) * float(size) * (1e9 if unit in "bB" else 1e6)
+
+
+def get_bits_per_parameter(weights_config: Dict[str, Any]) -> int:
+    """
+    Bits per weight of a weights config, from its quantization config or its dtype.
+    """
+    quant_config = weights_config.get("quant_config") or {}
+    if quant_config.get("load_in_4bit"):
+        return 4
+    if quant_config.get("load_in_8bit"):
+        return 8
+    if quant_config.get("bits") is not None:
+        return int(quant_config["bits"])
+    return BITS_PER_DTYPE.get(
+        str(weights_config.get("torch_dtype")).replace("torch.", ""), DEFAULT_BITS
+    )
+
+
+def load_model_config(
+    model: str, snapshot_folder: Optional[str] = None
+) -> Optional[Dict[str, Any]]:
+    """
+    Reads the `config.json` of a model, from its prefetched snapshot if any, or from
+    the HF cache or the Hub otherwise. Returns None if it is not available.
+    """
+    if snapshot_folder is not None:
+        model_config = read_json(os.path.join(snapshot_folder, "config.json"))
+        if model_config is not None:
+            return model_config
+
+    try:
+        return read_json(
+            hf_hub_download(
+                repo_id=model,
+                filename="config.json",
+                local_files_only=is_offline_mode(),
+            )
+        )
+    except Exception as e:
+        LOGGER.warning(f"Could not read the config of {model}, error:\n{e}")
+        return None
+
+
+class BenchmarkCostModel:
+    """
+    Predicts the duration of a benchmark from the size of the weights it loads.
+
+    The duration of a benchmark that already ran is the one it took. Otherwise it is
+    proportional to one plus the gigabytes of weights, at a rate fitted on the
+    durations of the benchmarks that ran before, or a default rate without history.
+
+    Args:
+        durations (Dict[str, float]): Durations in seconds of earlier runs, by subfolder.
+        weights_sizes (Dict[str, float]): Gigabytes of weights of the earlier runs, by
+            subfolder, the ones that are missing are not used to fit the rate.
+    """
+
+    def __init__(
+        self,
+        durations: Optional[Dict[str, float]] = None,
+        weights_sizes: Optional[Dict[str, float]] = None,
+    ):
+        self.durations = dict(durations or {})
+        rates = [
+            duration / (1 + weights_sizes[subfolder])
+            for subfolder, duration in self.durations.items()
+            if weights_sizes is not None and subfolder in weights_sizes
+        ]
+        self.seconds_per_unit = median(rates) if rates else DEFAULT_SECONDS_PER_UNIT
+
+    def predict(self, subfolder: str, weights_size: Optional[float]) -> float:
+        """
+        Predicts the duration in seconds of a benchmark.
+
+        Args:
+            subfolder (str): The subfolder of the benchmark.
+            weights_size (float, optional): Gigabytes of weights it loads, None if unknown,
+                in which case it is predicted as long as the longest known benchmark.
+        """
+        if subfolder in self.durations:
+            return self.durations[subfolder]
+        if weights_size is None:
+            return max(self.durations.values(), default=self.seconds_per_unit)
+        return self.seconds_per_unit * (1 + weights_size)
+
+
+def order_benchmarks(
+    benchmarks: List[Dict[str, Any]], costs: List[float], policy: str
+) -> List[Dict[str, Any]]:
+    """
+    Orders the benchmarks to run according to a policy:
+    - `product`: the order they were listed in.
+    - `sjf`: shortest job first.
+    - `model-first`: the cheapest benchmark of every model first, from the cheapest
+      model to the most expensive one, then the second cheapest of every model, etc.
+      so that the leaderboard covers every model as early as possible.
+
+    Sorting is stable, so benchmarks with the same cost keep their listed order.
+    """
+    if policy == PRODUCT_ORDER:
+        return list(benchmarks)
+
+    indices = sorted(range(len(benchmarks)), key=lambda index: costs[index])
+    if policy == SHORTEST_JOB_FIRST:
+        return [benchmarks[index] for index in indices]
+
+    if policy == MODEL_FIRST:
+        ranks, seen = {}, {}
+        for index in indices:
+            model = benchmarks[index]["model"]
+            ranks[index] = seen.get(model, 0)
+            seen[model] = ranks[index] + 1
+        return [
+            benchmarks[index]
+            for index in sorted(indices, key=lambda index: ranks[index])
+        ]
+
+    raise ValueError(
+        f"Unknown benchmark ordering policy {policy}, expected one of {ORDERING_POLICIES}"
+    )
+
+
+def select_within_budget(
+    benchmarks: List[Dict[str, Any]],
+    durations: List[float],
+    time_budget: float,
+    num_slots: int = 1,
+) -> List[Dict[str, Any]]:
+    """
+    Picks the benchmarks that complete within a time budget, shortest first, which
+    maximizes the number of completed benchmarks. Each benchmark is assigned to the
+    slot that frees up first, and is left out if it would end after the budget.
+
+    Args:
+        benchmarks (List[Dict[str, Any]]): The benchmarks to pick from.
+        durations (List[float]): The predicted duration of every benchmark, in seconds.
+        time_budget (float): The time available, in seconds.
+        num_slots (int): The number of benchmarks that run concurrently.
+
+    Returns:
+        List[Dict[str, Any]]: The picked benchmarks, shortest first.
+    """
+    slot_ends = [0.0] * max(1, num_slots)
+    selected = []
+    for index in sorted(range(len(benchmarks)), key=lambda index: durations[index]):
+        end = slot_ends[0] + durations[index]
+        if end > time_budget:
+            # every remaining benchmark is at least as long
+            break
+        heapq.heapreplace(slot_ends, end)
+        selected.append(benchmarks[index])
+    return selected
+
+
+def _shard_score(key: str, shard: int) -> int:
+    # stable across processes and machines, unlike hash()
+    return int.from_bytes(hashlib.sha256(f"{key}#{shard}".encode()).digest()[:8], "big")
+
+
+def assign_shards(
+    keys: List[str], costs: List[float], shard_count: int, balance: float = 1.1
+) -> List[int]:
+    """
+    Assigns every benchmark to a shard by consistent hashing with bounded loads.
+
+    Every benchmark prefers the shards in the order of a rendezvous hash of its key and
+    goes to the first one whose total cost stays below `balance` times the average, so
+    shards get about the same cost and a change of a few benchmarks only moves a few
+    others. The assignment only depends on the keys and costs, so every machine
+    computes the same one without coordination.
+
+    Args:
+        keys (List[str]): A stable identity of every benchmark.
+        costs (List[float]): The estimated cost of every benchmark, which must be the
+            same on every machine.
+        shard_count (int): The number of shards.
+        balance (float): How much more than the average cost a shard can hold.
+
+    Returns:
+        List[int]: The shard of every benchmark.
+    """
+    capacity = balance * sum(costs) / shard_count
+    loads = [0.0] * shard_count
+    shards = [0] * len(keys)
+    # the most expensive benchmarks are placed first, ties broken by key
+    for index in sorted(
+        range(len(keys)), key=lambda index: (-costs[index], keys[index])
+    ):
+        preferences = sorted(
+            range(shard_count),
+            key=lambda shard: _shard_score(keys[index], shard),
+            reverse=True,
+        )
+        shard = next(
+            (shard for shard in preferences if loads[shard] + costs[index] <= capacity),
+            min(range(shard_count), key=lambda shard: (loads[shard], shard)),
+        )
+        loads[shard] += costs[index]
+        shards[index] = shard
+    return shards
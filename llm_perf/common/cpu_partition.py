@@ -0,0 +1,166 @@
+import os
+from dataclasses import dataclass
+from glob import glob
+from typing import Dict, List, Optional
+
+NUMA_NODES_DIR = "/sys/devices/system/node"
+CPU_TOPOLOGY_DIR = "/sys/devices/system/cpu/cpu{cpu}/topology"
+
+
+@dataclass
+class CPUPartition:
+    cpus: List[int]
+    numa_node: Optional[int] = None
+
+    def __repr__(self):
+        return f"CPUPartition(cpus='{format_cpu_list(self.cpus)}', numa_node={self.numa_node})"
+
+
+def parse_cpu_list(cpu_list: str) -> List[int]:
+    """
+    Parses a kernel cpu list such as "0-3,8,10-11" into a sorted list of cpu ids.
+    """
+    cpus = set()
+    for chunk in cpu_list.strip().split(","):
+        if not chunk:
+            continue
+        if "-" in chunk:
+            start, end = chunk.split("-")
+            cpus.update(range(int(start), int(end) + 1))
+        else:
+            cpus.add(int(chunk))
+    return sorted(cpus)
+
+
+def format_cpu_list(cpus: List[int]) -> str:
+    """
+    Formats a list of cpu ids into a compact kernel cpu list such as "0-3,8,10-11".
+    """
+    ranges = []
+    for cpu in sorted(cpus):
+        if ranges and cpu == ranges[-1][1] + 1:
+            ranges[-1][1] = cpu
+        else:
+            ranges.append([cpu, cpu])
+    return ",".join(
+        f"{start}-{end}" if start != end else f"{start}" for start, end in ranges
+    )
+
+
+def _read_file(path: str) -> Optional[str]:
+    try:
+        with open(path, "r") as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def get_numa_nodes() -> Dict[int, List[int]]:
+    """
+    Returns the cpus usable by this process grouped by NUMA node.
+
+    Falls back to a single node holding all usable cpus when the NUMA topology
+    is not exposed (e.g. in some containers).
+    """
+    usable_cpus = os.sched_getaffinity(0)
+
+    numa_nodes = {}
+    for node_dir in glob(os.path.join(NUMA_NODES_DIR, "node[0-9]*")):
+        cpu_list = _read_file(os.path.join(node_dir, "cpulist"))
+        if cpu_list is None:
+            continue
+        cpus = [cpu for cpu in parse_cpu_list(cpu_list) if cpu in usable_cpus]
+        if cpus:
+            numa_nodes[int(os.path.basename(node_dir)[len("node") :])] = cpus
+
+    if not numa_nodes:
+        numa_nodes = {0: sorted(usable_cpus)}
+
+    return dict(sorted(numa_nodes.items()))
+
+
+def _sort_by_physical_core(cpus: List[int]) -> List[int]:
+    """
+    Orders cpus so that hyperthreads of the same physical core are adjacent,
+    which keeps sibling threads in the same partition when chunking.
+    """
+
+    def physical_core(cpu: int):
+        topology_dir = CPU_TOPOLOGY_DIR.format(cpu=cpu)
+        package_id = _read_file(os.path.join(topology_dir, "physical_package_id"))
+        core_id = _read_file(os.path.join(topology_dir, "core_id"))
+        if package_id is None or core_id is None:
+            return (0, cpu, cpu)
+        return (int(package_id), int(core_id), cpu)
+
+    return sorted(cpus, key=physical_core)
+
+
+def partition_cpus(
+    num_partitions: int, numa_nodes: Optional[Dict[int, List[int]]] = None
+) -> List[CPUPartition]:
+    """
+    Splits the machine into disjoint cpu sets of equal size.
+
+    Partitions never straddle NUMA nodes when there are at least as many partitions
+    as nodes, and hyperthreads of a physical core end up in the same partition
+    whenever the partition size allows it.
+    All partitions have the same number of cpus so that the measurements of the
+    benchmarks running on them stay comparable; leftover cpus are left idle.
+
+    Args:
+        num_partitions (int): Number of concurrent benchmarks to make room for.
+        numa_nodes (Dict[int, List[int]], optional): cpus grouped by NUMA node, defaults to the topology of this machine.
+
+    Returns:
+        List[CPUPartition]: The list of cpu partitions.
+    """
+    if num_partitions < 1:
+        raise ValueError(f"num_partitions should be at least 1, got {num_partitions}")
+
+    numa_nodes = numa_nodes if numa_nodes is not None else get_numa_nodes()
+    nodes = list(numa_nodes.keys())
+
+    if num_partitions <= len(nodes):
+        # each partition gets whole NUMA nodes
+        groups = [nodes[i::num_partitions] for i in range(num_partitions)]
+        size = min(sum(len(numa_nodes[node]) for node in group) for group in groups)
+        return [
+            CPUPartition(
+                cpus=sorted(
+                    _sort_by_physical_core(
+                        [cpu for node in group for cpu in numa_nodes[node]]
+                    )[:size]
+                ),
+                numa_node=group[0] if len(group) == 1 else None,
+            )
+            for group in groups
+        ]
+
+    # spread the partitions over the nodes, then carve each node into equal chunks
+    partitions_per_node = {node: num_partitions // len(nodes) for node in nodes}
+    for node in nodes[: num_partitions % len(nodes)]:
+        partitions_per_node[node] += 1
+
+    size = min(
+        len(numa_nodes[node]) // count
+        for node, count in partitions_per_node.items()
+        if count > 0
+    )
+    if size == 0:
+        raise ValueError(
+            f"Cannot split {sum(len(cpus) for cpus in numa_nodes.values())} cpus "
+            f"into {num_partitions} partitions"
+        )
+
+    partitions = []
+    for node, count in partitions_per_node.items():
+        cpus = _sort_by_physical_core(numa_nodes[node])
+        for i in range(count):
+            partitions.append(
+                CPUPartition(
+                    cpus=sorted(cpus[i * size : (i + 1) * size]), numa_node=node
+                )
+            )
+
+    return partitions
@@ -10,3 +10,101 @@ def is_debug_mode():
 
 def get_benchmark_top_n():
     return int(os.environ.get("BENCHMARK_TOP_N", "10"))
+
+
+def get_cpu_parallel_slots():
+    return int(os.environ.get("CPU_PARALLEL_SLOTS", "1"))
+
+
+def get_gpu_device_ids():
+    device_ids = os.environ.get("GPU_DEVICE_IDS", "")
+    return [device_id for device_id in device_ids.split(",") if device_id]
+
+
+def get_cache_dir():
+    return os.environ.get(
+        "LLM_PERF_CACHE_DIR",
+        os.path.join(os.path.expanduser("~"), ".cache", "llm-perf"),
+    )
+
+
+def get_model_list_cache_ttl():
+    return float(os.environ.get("MODEL_LIST_CACHE_TTL", str(24 * 60 * 60)))
+
+
+def is_offline_mode():
+    return (
+        os.environ.get("LLM_PERF_OFFLINE", "0") == "1"
+        or os.environ.get("HF_HUB_OFFLINE", "0") == "1"
+    )
+
+
+def get_model_list_file():
+    return os.environ.get("MODEL_LIST_FILE", None)
+
+
+def get_prefetch_workers():
+    return int(os.environ.get("PREFETCH_WORKERS", "8"))
+
+
+def is_adaptive_sampling():
+    return os.environ.get("ADAPTIVE_SAMPLING", "0") == "1"
+
+
+def get_transient_failure_retries():
+    return int(os.environ.get("TRANSIENT_FAILURE_RETRIES", "1"))
+
+
+def is_grouped_execution():
+    return os.environ.get("GROUPED_EXECUTION", "0") == "1"
+
+
+def is_shape_sweep():
+    return os.environ.get("SHAPE_SWEEP", "0") == "1"
+
+
+def get_sweep_batch_sizes():
+    batch_sizes = os.environ.get("SWEEP_BATCH_SIZES", "1,2,4,8,16,32,64")
+    return [int(batch_size) for batch_size in batch_sizes.split(",") if batch_size]
+
+
+def get_sweep_sequence_lengths():
+    sequence_lengths = os.environ.get("SWEEP_SEQUENCE_LENGTHS", "256,1024")
+    return [
+        int(sequence_length)
+        for sequence_length in sequence_lengths.split(",")
+        if sequence_length
+    ]
+
+
+def get_trace_dir():
+    return os.environ.get("TRACE_DIR", os.path.join(get_cache_dir(), "traces"))
+
+
+def get_benchmark_order():
+    return os.environ.get("BENCHMARK_ORDER", "product")
+
+
+def get_shard_index():
+    return int(os.environ.get("SHARD_INDEX", "0"))
+
+
+def get_shard_count():
+    return int(os.environ.get("SHARD_COUNT", "1"))
+
+
+def get_work_queue():
+    return os.environ.get("WORK_QUEUE", None)
+
+
+def get_work_queue_lease_duration():
+    return float(os.environ.get("WORK_QUEUE_LEASE_DURATION", "300"))
+
+
+def is_warm_workers():
+    return os.environ.get("WARM_WORKERS", "0") == "1"
+
+
+def get_machine_memory():
+    memory = os.environ.get("MACHINE_MEMORY", None)
+    return float(memory) if memory else None
@@ -0,0 +1,84 @@
+import gc
+import traceback
+from typing import Any, Dict, List
+
+from hydra.utils import get_class
+from optimum_benchmark import Benchmark, BenchmarkConfig, BenchmarkReport
+
+from llm_perf.common.skip_list import DETERMINISTIC, classify_failure
+
+
+def _release_memory():
+    gc.collect()
+
+    import torch
+
+    if torch.cuda.is_available():
+        torch.cuda.empty_cache()
+        torch.cuda.reset_peak_memory_stats()
+
+
+def _drop_ram_metrics(report_dict: Dict[str, Any]) -> Dict[str, Any]:
+    for measurements in report_dict.values():
+        if isinstance(measurements, dict) and measurements.get("memory") is not None:
+            measurements["memory"]["max_ram"] = None
+    return report_dict
+
+
+def run_benchmark_group(benchmark_configs: List[BenchmarkConfig]) -> BenchmarkReport:
+    """
+    Runs several benchmarks one after the other in the current process, so that they
+    share the interpreter, the imports and the warm caches.
+
+    Every benchmark gets its own backend, scenario and trackers, and memory is released
+    between benchmarks. The group stops at the first failure that is not deterministic
+    (e.g. an OOM), since it may leave the process in a bad state.
+
+    The RSS of the process is not given back between benchmarks, so only the first
+    benchmark of the group keeps its `max_ram`, the others have it set to None. Only
+    CUDA benchmarks are grouped, their device memory metrics are reset per benchmark.
+
+    Args:
+        benchmark_configs (List[BenchmarkConfig]): The benchmarks to run.
+
+    Returns:
+        BenchmarkReport: A report whose `results` holds one result per benchmark that
+            ran, in order, either `{"report": <report dict>}` or
+            `{"traceback": <traceback>}`.
+    """
+    results = []
+    for index, benchmark_config in enumerate(benchmark_configs):
+        try:
+            report = Benchmark.run(benchmark_config)
+            if benchmark_config.log_report:
+                report.log()
+            report_dict = report.to_dict()
+            if index > 0:
+                report_dict = _drop_ram_metrics(report_dict)
+            results.append({"report": report_dict})
+        except Exception:
+            error_traceback = traceback.format_exc()
+            results.append({"traceback": error_traceback})
+            if classify_failure(error_traceback) != DETERMINISTIC:
+                break
+        finally:
+            _release_memory()
+
+    # a list is kept as is by the report, which sends it back to the main process
+    return BenchmarkReport.from_dict({"results": results})
+
+
+def launch_benchmark_group(
+    benchmark_configs: List[BenchmarkConfig],
+) -> List[Dict[str, Any]]:
+    """
+    Runs a group of benchmarks in a single isolated process, started by the launcher of
+    the group's first benchmark like `Benchmark.launch` would, so that the group keeps
+    its numactl binding and its device isolation (one monitor for the group process).
+    """
+    launcher_config = benchmark_configs[0].launcher
+    launcher = get_class(launcher_config._target_)(launcher_config)
+    report = launcher.launch(
+        worker=run_benchmark_group, worker_args=[benchmark_configs]
+    )
+    return report.results
@@ -1,8 +1,13 @@
+import os
 from dataclasses import dataclass
-from typing import List
+from typing import List, Optional
 
 import yaml
 
+HARDWARE_CONFIG_FILE = os.path.join(
+    os.path.dirname(os.path.dirname(__file__)), "hardware.yaml"
+)
+
 
 @dataclass
 class HardwareConfig:
@@ -10,11 +15,13 @@ class HardwareConfig:
     hardware: str
     subsets: List[str]
     backends: List[str]
+    # gigabytes of memory the benchmarks run in: device memory on GPUs, RAM on CPUs
+    memory: Optional[float] = None
 
     def __repr__(self):
         return (
             f"HardwareConfig(machine='{self.machine}', hardware='{self.hardware}', "
-            f"subsets={self.subsets}, backends={self.backends})"
+            f"subsets={self.subsets}, backends={self.backends}, memory={self.memory})"
         )
 
 
@@ -22,3 +29,12 @@ def load_hardware_configs(file_path: str) -> List[HardwareConfig]:
     with open(file_path, "r") as file:
         data = yaml.safe_load(file)
     return [HardwareConfig(**config) for config in data]
+
+
+def get_hardware_config(
+    machine: str, file_path: str = HARDWARE_CONFIG_FILE
+) -> Optional[HardwareConfig]:
+    for hardware_config in load_hardware_configs(file_path):
+        if hardware_config.machine == machine:
+            return hardware_config
+    return None
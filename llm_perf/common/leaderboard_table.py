@@ -0,0 +1,241 @@
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+# columns of the perf dataframes kept in the leaderboard table, under shorter names
+CONFIG_COLUMNS = {
+    "config.backend.model": "model",
+    "config.name": "config",
+    "config.backend.torch_dtype": "dtype",
+    "config.backend.quantization_scheme": "quantization",
+    "config.backend.attn_implementation": "attn_implementation",
+    "config.scenario.input_shapes.batch_size": "batch_size",
+    "config.scenario.input_shapes.sequence_length": "sequence_length",
+    "config.scenario.generate_kwargs.max_new_tokens": "new_tokens",
+}
+METRIC_COLUMNS = {
+    "report.prefill.latency.mean": "prefill_latency_s",
+    "report.decode.latency.mean": "decode_latency_s",
+    "report.prefill.throughput.value": "prefill_tokens_per_s",
+    "report.decode.throughput.value": "decode_tokens_per_s",
+    "report.decode.energy.total": "decode_energy_kwh",
+    "report.decode.efficiency.value": "decode_tokens_per_kwh",
+    "report.decode.memory.max_allocated": "max_allocated_mb",
+    "report.decode.memory.max_ram": "max_ram_mb",
+}
+# columns of the open-llm leaderboard joined to the table, under shorter names
+LLM_COLUMNS = {
+    "Model": "model",
+    "Type": "model_type",
+    "Architecture": "architecture",
+    "#Params (B)": "params_b",
+    "Average ⬆️": "open_llm_score",
+}
+# the largest batch size that fits, found by a shape sweep, at a sequence length
+MAX_BATCH_SIZE_COLUMN = "report.max_batch_size"
+# the rows of a model and config on a machine at a sequence length share their
+# largest batch size
+MAX_BATCH_SIZE_KEY_COLUMNS = [
+    "model",
+    "machine",
+    "hardware",
+    "backend",
+    "subset",
+    "config",
+    "sequence_length",
+]
+# a row is identified by its model and config, on a machine, at its input shapes
+KEY_COLUMNS = [
+    "model",
+    "machine",
+    "hardware",
+    "backend",
+    "subset",
+    "config",
+    "batch_size",
+    "sequence_length",
+]
+# the float32 baseline of a row runs the same model the same way, at full precision
+BASELINE_COLUMNS = [
+    "model",
+    "machine",
+    "hardware",
+    "backend",
+    "attn_implementation",
+    "batch_size",
+    "sequence_length",
+]
+# the attention implementations whose float32 baseline stands in, in this order, for
+# the ones that never run in float32 (flash_attention_2)
+FALLBACK_BASELINE_ATTN_IMPLEMENTATIONS = ["sdpa", "eager"]
+JOULES_PER_KWH = 3.6e6
+
+
+def _select(df: pd.DataFrame, columns: Dict[str, str]) -> pd.DataFrame:
+    return pd.DataFrame(
+        {
+            name: df[column] if column in df.columns else None
+            for column, name in columns.items()
+        },
+        index=df.index,
+    )
+
+
+def build_leaderboard_table(
+    perf_dfs: Dict[Tuple[str, str, str, str], pd.DataFrame],
+    llm_df: Optional[pd.DataFrame] = None,
+) -> pd.DataFrame:
+    """
+    Joins the perf dataframes of all machines into a single compact table, with one row
+    per model and config on every machine, and derives the metrics readers compare.
+
+    Failed and skipped benchmarks are dropped, and the largest batch sizes found by
+    shape sweeps become the `max_batch_size` of the rows of their model and config at
+    their sequence length. A benchmark found several times
+    appears once, with the report that comes last in its perf dataframe (reports do
+    not record when they were pushed). The models are joined with their row of the
+    open-llm leaderboard, when given. The float32 baseline of a row is the float32 row
+    with the same attention implementation, or the sdpa (then eager) one for the
+    attention implementations that do not support float32. For the backends that do
+    not record their attention implementation, it is the median of their float32
+    configs.
+
+    Args:
+        perf_dfs (Dict[Tuple[str, str, str, str], pd.DataFrame]): The perf dataframes,
+            by (subset, machine, backend, hardware).
+        llm_df (pd.DataFrame, optional): The open-llm leaderboard dataframe.
+
+    Returns:
+        pd.DataFrame: The leaderboard table, sorted by model, machine and config.
+    """
+    tables: List[pd.DataFrame] = []
+    max_batch_size_tables: List[pd.DataFrame] = []
+    for (subset, machine, backend, hardware), perf_df in perf_dfs.items():
+        failed = pd.Series(False, index=perf_df.index)
+        for column in ("report.traceback", "report.skipped"):
+            if column in perf_df.columns:
+                failed |= perf_df[column].notna()
+        is_max_batch_size = pd.Series(False, index=perf_df.index)
+        if MAX_BATCH_SIZE_COLUMN in perf_df.columns:
+            is_max_batch_size = perf_df[MAX_BATCH_SIZE_COLUMN].notna()
+
+        table = pd.concat(
+            [
+                _select(perf_df, CONFIG_COLUMNS),
+                _select(perf_df, METRIC_COLUMNS),
+                _select(perf_df, {MAX_BATCH_SIZE_COLUMN: "max_batch_size"}),
+            ],
+            axis=1,
+        )
+        table["machine"] = machine
+        table["hardware"] = hardware
+        table["backend"] = backend
+        table["subset"] = subset
+        tables.append(
+            table[~failed & ~is_max_batch_size].drop(columns="max_batch_size")
+        )
+        max_batch_size_tables.append(
+            table.loc[
+                is_max_batch_size, [*MAX_BATCH_SIZE_KEY_COLUMNS, "max_batch_size"]
+            ]
+        )
+
+    columns = [*KEY_COLUMNS, *CONFIG_COLUMNS.values(), *METRIC_COLUMNS.values()]
+    if not tables:
+        return pd.DataFrame(columns=[*dict.fromkeys(columns), "max_batch_size"])
+    table = pd.concat(tables, ignore_index=True)[list(dict.fromkeys(columns))]
+
+    for column in [
+        *METRIC_COLUMNS.values(),
+        "batch_size",
+        "sequence_length",
+        "new_tokens",
+    ]:
+        table[column] = pd.to_numeric(table[column], errors="coerce")
+    for column in ("dtype", "quantization", "attn_implementation"):
+        table[column] = table[column].fillna("").astype(str)
+    table = table.drop_duplicates(subset=KEY_COLUMNS, keep="last")
+
+    max_batch_sizes = pd.concat(max_batch_size_tables, ignore_index=True)
+    max_batch_sizes["sequence_length"] = pd.to_numeric(
+        max_batch_sizes["sequence_length"], errors="coerce"
+    )
+    max_batch_sizes["max_batch_size"] = pd.to_numeric(
+        max_batch_sizes["max_batch_size"], errors="coerce"
+    )
+    table = table.merge(
+        max_batch_sizes.drop_duplicates(subset=MAX_BATCH_SIZE_KEY_COLUMNS, keep="last"),
+        on=MAX_BATCH_SIZE_KEY_COLUMNS,
+        how="left",
+    )
+
+    if llm_df is not None and "Model" in llm_df.columns:
+        llm_table = _select(
+            llm_df.drop_duplicates(subset=["Model"]),
+            {
+                column: name
+                for column, name in LLM_COLUMNS.items()
+                if column in llm_df.columns
+            },
+        )
+        table = table.merge(llm_table, on="model", how="left")
+    for name in list(LLM_COLUMNS.values())[1:]:
+        if name not in table.columns:
+            table[name] = np.nan
+    params_b = pd.to_numeric(table["params_b"], errors="coerce")
+
+    # derived metrics, a NaN wherever one of their inputs is missing
+    new_tokens = table["batch_size"] * table["new_tokens"]
+    table["generate_tokens_per_s"] = new_tokens / (
+        table["prefill_latency_s"] + table["decode_latency_s"]
+    )
+    table["decode_tokens_per_joule"] = table["decode_tokens_per_kwh"] / JOULES_PER_KWH
+    table["memory_mb"] = table["max_allocated_mb"].combine_first(table["max_ram_mb"])
+    table["memory_mb_per_billion_params"] = table["memory_mb"] / params_b.where(
+        params_b > 0
+    )
+
+    is_baseline = (table["dtype"] == "float32") & (
+        table["quantization"].isin(["", "none"])
+    )
+    baseline = (
+        table[is_baseline]
+        .groupby(BASELINE_COLUMNS, dropna=False)["decode_tokens_per_s"]
+        .median()
+        .rename("baseline_decode_tokens_per_s")
+    )
+    table = table.join(baseline, on=BASELINE_COLUMNS)
+    other_columns = [
+        column for column in BASELINE_COLUMNS if column != "attn_implementation"
+    ]
+    for attn_implementation in FALLBACK_BASELINE_ATTN_IMPLEMENTATIONS:
+        fallback = (
+            table[is_baseline & (table["attn_implementation"] == attn_implementation)]
+            .groupby(other_columns, dropna=False)["decode_tokens_per_s"]
+            .median()
+            .rename("fallback_decode_tokens_per_s")
+        )
+        table = table.join(fallback, on=other_columns)
+        table["baseline_decode_tokens_per_s"] = table[
+            "baseline_decode_tokens_per_s"
+        ].fillna(table.pop("fallback_decode_tokens_per_s"))
+    table["decode_speedup_vs_float32"] = table["decode_tokens_per_s"] / table.pop(
+        "baseline_decode_tokens_per_s"
+    )
+
+    return table.sort_values(
+        ["model", "machine", "backend", "config"], kind="stable"
+    ).reset_index(drop=True)
+
+
+def write_leaderboard_table(table: pd.DataFrame, path: str) -> None:
+    """
+    Writes the leaderboard table as a single Parquet file, with the string columns,
+    which have few distinct values, dictionary encoded.
+    """
+    table = table.copy()
+    for column in table.columns:
+        if not pd.api.types.is_numeric_dtype(table[column]):
+            table[column] = table[column].astype("category")
+    table.to_parquet(path, index=False, compression="zstd")
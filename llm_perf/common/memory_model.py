@@ -0,0 +1,127 @@
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+from llm_perf.common.cost_model import (
+    BITS_PER_DTYPE,
+    DEFAULT_BITS,
+    estimate_num_parameters,
+    first_config_value,
+    get_bits_per_parameter,
+)
+
+# gigabytes taken regardless of the model: CUDA context or interpreter, libraries and
+# allocator fragmentation
+DEFAULT_OVERHEAD = 1.0
+# share of the memory capacity a benchmark may use, the rest covers what the estimate
+# misses (temporary buffers of the kernels, memory reserved by the driver)
+DEFAULT_HEADROOM = 0.9
+
+
+@dataclass
+class MemoryEstimate:
+    """
+    Estimated peak memory of a benchmark, in gigabytes.
+    """
+
+    weights: float
+    kv_cache: float
+    activations: float
+    overhead: float = DEFAULT_OVERHEAD
+
+    @property
+    def total(self) -> float:
+        return self.weights + self.kv_cache + self.activations + self.overhead
+
+    def to_dict(self) -> Dict[str, float]:
+        return {
+            "weights": self.weights,
+            "kv_cache": self.kv_cache,
+            "activations": self.activations,
+            "overhead": self.overhead,
+            "total": self.total,
+        }
+
+
+def get_activation_bits(weights_config: Dict[str, Any]) -> int:
+    """
+    Bits per value of the activations and KV cache, the dtype the model computes in,
+    which is also the one of the non-quantized layers of quantized models.
+    """
+    return BITS_PER_DTYPE.get(
+        str(weights_config.get("torch_dtype")).replace("torch.", ""), DEFAULT_BITS
+    )
+
+
+def estimate_kv_cache_size(
+    model_config: Dict[str, Any], batch_size: int, num_tokens: int, bits: int
+) -> Optional[float]:
+    """
+    Gigabytes of the keys and values cached by every layer for `num_tokens` tokens of
+    `batch_size` sequences, None if the config does not describe the attention sizes.
+    """
+    model_config = {**model_config, **(model_config.get("text_config") or {})}
+    hidden_size = first_config_value(model_config, "hidden_size", "n_embd", "d_model")
+    num_layers = first_config_value(
+        model_config, "num_hidden_layers", "n_layer", "num_layers"
+    )
+    if hidden_size is None or num_layers is None:
+        return None
+
+    num_heads = first_config_value(model_config, "num_attention_heads", "n_head") or 1
+    num_kv_heads = first_config_value(model_config, "num_key_value_heads") or num_heads
+    head_dim = first_config_value(model_config, "head_dim") or hidden_size // num_heads
+    num_values = 2 * num_layers * num_kv_heads * head_dim * batch_size * num_tokens
+    return num_values * bits / 8 / 1e9
+
+
+def estimate_memory(
+    model_config: Dict[str, Any],
+    weights_config: Dict[str, Any],
+    batch_size: int,
+    sequence_length: int,
+    max_new_tokens: int = 0,
+    overhead: float = DEFAULT_OVERHEAD,
+) -> Optional[MemoryEstimate]:
+    """
+    Estimates the peak memory of generating `max_new_tokens` tokens after a prompt of
+    `sequence_length` tokens, for `batch_size` sequences.
+
+    The weights take their quantized size, the KV cache grows to the full sequence, and
+    the largest activation is the prefill logits over the vocabulary, which generation
+    computes in float32.
+
+    Args:
+        model_config (Dict[str, Any]): The `config.json` of the model.
+        weights_config (Dict[str, Any]): The dtype and quantization config of the weights.
+        batch_size (int): The number of sequences.
+        sequence_length (int): The number of tokens of every prompt.
+        max_new_tokens (int): The number of generated tokens.
+        overhead (float): Gigabytes taken regardless of the model.
+
+    Returns:
+        Optional[MemoryEstimate]: The estimate, None if the config does not describe the
+            architecture's sizes.
+    """
+    num_parameters = estimate_num_parameters(model_config)
+    activation_bits = get_activation_bits(weights_config)
+    kv_cache = estimate_kv_cache_size(
+        model_config, batch_size, sequence_length + max_new_tokens, activation_bits
+    )
+    if num_parameters is None or kv_cache is None:
+        return None
+
+    vocab_size = first_config_value(
+        {**model_config, **(model_config.get("text_config") or {})}, "vocab_size"
+    )
+    return MemoryEstimate(
+        weights=num_parameters * get_bits_per_parameter(weights_config) / 8 / 1e9,
+        kv_cache=kv_cache,
+        activations=batch_size * sequence_length * (vocab_size or 0) * 4 / 1e9,
+        overhead=overhead,
+    )
+
+
+def fits_in_memory(
+    estimate: MemoryEstimate, capacity: float, headroom: float = DEFAULT_HEADROOM
+) -> bool:
+    return estimate.total <= headroom * capacity
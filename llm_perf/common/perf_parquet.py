@@ -0,0 +1,197 @@
+import json
+import math
+import numbers
+from typing import Any, List, Optional, Sequence
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# string columns under these prefixes have few distinct values (models, backends, configs)
+CATEGORICAL_PREFIXES = ("config.",)
+# columns under these prefixes are measurements
+METRIC_PREFIXES = ("report.",)
+# the type of a column is declared by its name, the last key of which is its field
+# measurements that are counts rather than continuous values
+COUNT_FIELDS = {"count", "max_batch_size"}
+# measurements that are the list of every sample
+LIST_FIELDS = {"values"}
+# report fields that hold text: units, and the reason a benchmark failed or was skipped
+REPORT_STRING_FIELDS = {"unit", "traceback", "skipped"}
+# config fields that are flags
+CONFIG_BOOL_FIELDS = {
+    "autocast_enabled",
+    "device_isolation",
+    "energy",
+    "eval_mode",
+    "latency",
+    "log_report",
+    "low_cpu_mem_usage",
+    "memory",
+    "no_weights",
+    "numactl",
+    "print_report",
+    "torch_compile",
+    "trust_remote_code",
+}
+# config fields that are integers, besides the input shapes
+CONFIG_INT_FIELDS = {
+    "duration",
+    "iterations",
+    "max_new_tokens",
+    "min_new_tokens",
+    "num_samples",
+    "seed",
+    "warmup_runs",
+}
+INPUT_SHAPES_PREFIX = "config.scenario.input_shapes."
+# columns the rows are sorted by, so that row-group statistics allow skipping groups
+SORT_COLUMNS = ("config.backend.model", "config.name")
+ROW_GROUP_SIZE = 1024
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, numbers.Real) and not isinstance(value, bool)
+
+
+def _is_missing(value: Any) -> bool:
+    return value is None or (isinstance(value, float) and math.isnan(value))
+
+
+def _to_json_string(value: Any) -> Optional[str]:
+    if value is None:
+        return None
+    return value if isinstance(value, str) else json.dumps(value)
+
+
+def _to_float(value: Any) -> Optional[float]:
+    if isinstance(value, bool):
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _to_int(value: Any) -> Optional[int]:
+    number = _to_float(value)
+    if number is None or math.isinf(number) or not number.is_integer():
+        return None
+    return int(number)
+
+
+def _to_bool(value: Any) -> Optional[bool]:
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, str) and value.lower() in ("true", "false"):
+        return value.lower() == "true"
+    if _is_number(value) and value in (0, 1):
+        return bool(value)
+    return None
+
+
+def _to_float_list(value: Any) -> Optional[List[float]]:
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except ValueError:
+            return None
+    if isinstance(value, list) and all(_is_number(item) for item in value):
+        return [float(item) for item in value]
+    return None
+
+
+def get_column_type(name: str, categorical_prefixes: Sequence[str]) -> pa.DataType:
+    """
+    Returns the declared arrow type of a column, from its name only, so that the schema
+    is the same on every run and machine whatever the values (e.g. all null).
+    """
+    field = name.rsplit(".", 1)[-1]
+    if name.startswith(METRIC_PREFIXES):
+        if field == "unit":
+            return pa.dictionary(pa.int32(), pa.string())
+        if field in REPORT_STRING_FIELDS:
+            return pa.string()
+        if field in COUNT_FIELDS:
+            return pa.int64()
+        if field in LIST_FIELDS:
+            return pa.list_(pa.float32())
+        return pa.float32()
+    if name.startswith(tuple(categorical_prefixes)):
+        if field in CONFIG_BOOL_FIELDS:
+            return pa.bool_()
+        if field in CONFIG_INT_FIELDS or name.startswith(INPUT_SHAPES_PREFIX):
+            return pa.int64()
+        return pa.dictionary(pa.int32(), pa.string())
+    return pa.string()
+
+
+def _convert(value: Any, data_type: pa.DataType) -> Any:
+    if value is None:
+        return None
+    if pa.types.is_floating(data_type):
+        return _to_float(value)
+    if pa.types.is_integer(data_type):
+        return _to_int(value)
+    if pa.types.is_boolean(data_type):
+        return _to_bool(value)
+    if pa.types.is_list(data_type):
+        return _to_float_list(value)
+    # anything else is text, non-string values are kept as JSON
+    return _to_json_string(value)
+
+
+def to_typed_table(
+    df: pd.DataFrame, categorical_prefixes: Sequence[str] = CATEGORICAL_PREFIXES
+) -> pa.Table:
+    """
+    Converts a perf dataframe into an arrow table with an explicit schema declared by
+    the column names: config columns are dictionary encoded strings (categorical),
+    flags or integers, measurements are float32 (int64 for counts) and other columns
+    are strings. A value that does not fit the type of its column is stored as null.
+
+    Args:
+        df (pd.DataFrame): The dataframe to convert, typically with object columns.
+        categorical_prefixes (Sequence[str]): Prefixes of the string columns to dictionary encode.
+
+    Returns:
+        pa.Table: The typed table.
+    """
+    arrays, fields = [], []
+    for name in df.columns:
+        data_type = get_column_type(name, categorical_prefixes)
+        column = [
+            None if _is_missing(value) else _convert(value, data_type)
+            for value in df[name]
+        ]
+        if pa.types.is_dictionary(data_type):
+            array = pa.array(column, type=pa.string()).dictionary_encode()
+        else:
+            array = pa.array(column, type=data_type)
+
+        arrays.append(array)
+        fields.append(pa.field(name, array.type))
+
+    return pa.Table.from_arrays(arrays, schema=pa.schema(fields))
+
+
+def write_perf_parquet(
+    df: pd.DataFrame,
+    path: str,
+    categorical_prefixes: Sequence[str] = CATEGORICAL_PREFIXES,
+) -> None:
+    """
+    Writes a perf dataframe as a typed Parquet file, sorted by model and config so that
+    readers can skip row groups using their min/max statistics.
+    """
+    sort_columns = [column for column in SORT_COLUMNS if column in df.columns]
+    if sort_columns:
+        df = df.sort_values(sort_columns, kind="stable", na_position="last")
+
+    pq.write_table(
+        to_typed_table(df, categorical_prefixes=categorical_prefixes),
+        path,
+        row_group_size=ROW_GROUP_SIZE,
+        write_statistics=True,
+        compression="zstd",
+    )
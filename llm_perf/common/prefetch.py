@@ -0,0 +1,53 @@
+from concurrent.futures import ThreadPoolExecutor
+from logging import getLogger
+from typing import Dict, List
+
+from huggingface_hub import snapshot_download
+
+from llm_perf.common.dependency import is_offline_mode
+
+LOGGER = getLogger("llm-perf-backend")
+
+# everything a no-weights benchmark resolves from the Hub: configs, tokenizer files
+# and remote code, but never the weights
+MODEL_ARTIFACT_PATTERNS = [
+    "*.json",
+    "*.py",
+    "*.txt",
+    "*.model",
+    "*.tiktoken",
+    "tokenizer*",
+]
+
+
+def prefetch_model_artifacts(models: List[str], max_workers: int = 8) -> Dict[str, str]:
+    """
+    Downloads the small artifacts of the given models into the HF cache concurrently.
+
+    Args:
+        models (List[str]): The model ids to prefetch.
+        max_workers (int): Number of concurrent downloads.
+
+    Returns:
+        Dict[str, str]: The snapshot folder of every model that was prefetched, models
+            that failed are left out and logged.
+    """
+    local_files_only = is_offline_mode()
+
+    def prefetch(model: str) -> str:
+        return snapshot_download(
+            repo_id=model,
+            allow_patterns=MODEL_ARTIFACT_PATTERNS,
+            local_files_only=local_files_only,
+        )
+
+    snapshot_folders = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {model: pool.submit(prefetch, model) for model in models}
+        for model, future in futures.items():
+            try:
+                snapshot_folders[model] = future.result()
+            except Exception as e:
+                LOGGER.warning(f"Could not prefetch {model}, error:\n{e}")
+
+    return snapshot_folders
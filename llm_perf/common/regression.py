@@ -0,0 +1,177 @@
+import re
+from typing import List, Tuple
+
+import numpy as np
+import pandas as pd
+
+# a benchmark is identified by its model and config, and its input shapes when they vary
+KEY_COLUMNS = ("config.backend.model", "config.name")
+OPTIONAL_KEY_COLUMNS = (
+    "config.scenario.input_shapes.batch_size",
+    "config.scenario.input_shapes.sequence_length",
+)
+
+# reports that only hold the largest batch size found by a shape sweep
+MAX_BATCH_SIZE_COLUMN = "report.max_batch_size"
+
+# the compared metrics, with whether a higher value is better
+METRIC_PATTERN = re.compile(
+    r"^report\.(?P<target>\w+)\."
+    r"(?P<metric>latency\.mean|throughput\.value|memory\.max_\w+|energy\.total|efficiency\.value)$"
+)
+HIGHER_IS_BETTER = ("throughput", "efficiency")
+
+# a change is significant when it is both statistically significant, at this number of
+# standard errors, and larger than this relative change
+Z_THRESHOLD = 3.0
+MIN_RELATIVE_CHANGE = 0.05
+
+REGRESSION_COLUMNS = [
+    *KEY_COLUMNS,
+    "metric",
+    "previous",
+    "current",
+    "relative_change",
+    "z_score",
+    "regression",
+]
+
+
+def _numeric(df: pd.DataFrame, column: str) -> np.ndarray:
+    if column not in df.columns:
+        return np.full(len(df), np.nan)
+    return pd.to_numeric(df[column], errors="coerce").to_numpy(dtype=float)
+
+
+def get_metric_columns(columns: List[str]) -> List[Tuple[str, str, bool]]:
+    """
+    Lists the compared metric columns, as (column, target, higher is better).
+    """
+    metric_columns = []
+    for column in columns:
+        match = METRIC_PATTERN.match(column)
+        if match is not None:
+            higher_is_better = match["metric"].split(".")[0] in HIGHER_IS_BETTER
+            metric_columns.append((column, match["target"], higher_is_better))
+    return metric_columns
+
+
+def detect_regressions(
+    previous_df: pd.DataFrame,
+    current_df: pd.DataFrame,
+    z_threshold: float = Z_THRESHOLD,
+    min_relative_change: float = MIN_RELATIVE_CHANGE,
+) -> pd.DataFrame:
+    """
+    Compares every metric of the benchmarks found in both perf dataframes.
+
+    Latency means are compared with a z-score: their difference over the combined
+    standard error of both means, from their stored stdev and count (a normal
+    approximation, with no degrees of freedom). Throughputs use the relative standard
+    error of the latency of the same target. Memory and energy have no stored spread,
+    so only their relative change is tested.
+
+    Args:
+        previous_df (pd.DataFrame): The perf dataframe that was published before.
+        current_df (pd.DataFrame): The new perf dataframe.
+        z_threshold (float): Number of standard errors a change must exceed.
+        min_relative_change (float): Relative change a change must exceed.
+
+    Returns:
+        pd.DataFrame: One row per significant change, with `regression` set when the
+            change is for the worse, regressions first.
+    """
+    key_columns = list(KEY_COLUMNS) + [
+        column
+        for column in OPTIONAL_KEY_COLUMNS
+        if column in previous_df.columns and column in current_df.columns
+    ]
+    if any(
+        column not in df.columns
+        for column in key_columns
+        for df in (previous_df, current_df)
+    ):
+        return pd.DataFrame(columns=REGRESSION_COLUMNS)
+
+    # the largest batch size of a sweep has the key of a benchmark, not its metrics
+    previous_df, current_df = (
+        df[df[MAX_BATCH_SIZE_COLUMN].isna()]
+        if MAX_BATCH_SIZE_COLUMN in df.columns
+        else df
+        for df in (previous_df, current_df)
+    )
+    # a benchmark that was pushed several times appears once, with its last report
+    previous_df = previous_df.drop_duplicates(subset=key_columns, keep="last")
+    current_df = current_df.drop_duplicates(subset=key_columns, keep="last")
+    for df in (previous_df, current_df):
+        for column in key_columns[len(KEY_COLUMNS) :]:
+            df[column] = pd.to_numeric(df[column], errors="coerce")
+    joined = previous_df.merge(
+        current_df, on=key_columns, how="inner", suffixes=(".previous", ".current")
+    )
+
+    metric_columns = get_metric_columns(
+        [column for column in current_df.columns if column in previous_df.columns]
+    )
+    changes = []
+    for column, target, higher_is_better in metric_columns:
+        previous = _numeric(joined, f"{column}.previous")
+        current = _numeric(joined, f"{column}.current")
+
+        latency = f"report.{target}.latency"
+        stats = {}
+        for side in ("previous", "current"):
+            mean = _numeric(joined, f"{latency}.mean.{side}")
+            stdev = _numeric(joined, f"{latency}.stdev.{side}")
+            count = _numeric(joined, f"{latency}.count.{side}")
+            # relative standard error of the mean latency, shared by the throughput
+            stats[side] = stdev / np.abs(mean) / np.sqrt(np.maximum(count, 1))
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            relative_change = (current - previous) / np.abs(previous)
+            if column.endswith("latency.mean") or column.endswith("throughput.value"):
+                standard_error = np.sqrt(
+                    (stats["previous"] * previous) ** 2
+                    + (stats["current"] * current) ** 2
+                )
+                z_score = (current - previous) / standard_error
+            else:
+                z_score = np.full(len(joined), np.nan)
+
+        significant = np.abs(relative_change) > min_relative_change
+        # without a usable spread, the relative change alone decides
+        significant &= np.isnan(z_score) | (np.abs(z_score) > z_threshold)
+        worse = relative_change < 0 if higher_is_better else relative_change > 0
+
+        rows = joined.loc[significant, key_columns].copy()
+        rows["metric"] = column
+        rows["previous"] = previous[significant]
+        rows["current"] = current[significant]
+        rows["relative_change"] = relative_change[significant]
+        rows["z_score"] = z_score[significant]
+        rows["regression"] = worse[significant]
+        changes.append(rows)
+
+    if not changes:
+        return pd.DataFrame(
+            columns=key_columns + REGRESSION_COLUMNS[len(KEY_COLUMNS) :]
+        )
+    return (
+        pd.concat(changes, ignore_index=True)
+        .sort_values(
+            ["regression", "relative_change"],
+            ascending=False,
+            key=lambda column: (
+                column.abs() if column.name == "relative_change" else column
+            ),
+        )
+        .reset_index(drop=True)
+    )
+
+
+def summarize_regressions(changes: pd.DataFrame) -> str:
+    num_regressions = int(changes["regression"].astype(bool).sum())
+    return (
+        f"{num_regressions} regressions and {len(changes) - num_regressions} "
+        f"improvements"
+    )
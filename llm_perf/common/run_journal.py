@@ -0,0 +1,209 @@
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, Optional
+
+from llm_perf.common.completion_index import BenchmarkCompletionIndex
+from llm_perf.common.dependency import get_cache_dir
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+PUSHED = "pushed"
+SKIPPED = "skipped"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS benchmarks (
+    subfolder TEXT PRIMARY KEY,
+    state TEXT NOT NULL,
+    pid INTEGER,
+    started_at REAL,
+    ended_at REAL,
+    error TEXT
+)
+"""
+
+
+def _is_process_alive(pid: Optional[int]) -> bool:
+    if pid is None:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class RunJournal:
+    """
+    Local SQLite journal of the state of every benchmark of a push repo.
+
+    A benchmark goes from pending to running, then to done or failed once its report
+    is produced, and to pushed once its `benchmark.json` is uploaded; the traceback of
+    a failed benchmark is kept after it is pushed. Only pushed benchmarks without a
+    traceback count as conducted, so anything interrupted by a crash is run again.
+    A benchmark skipped before launch (e.g. because it would not fit in memory) is
+    skipped, and is reconsidered by every run.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.lock = threading.Lock()
+        # shared by the scheduler and uploader threads, serialized by the lock
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute(SCHEMA)
+        self.connection.commit()
+
+    @classmethod
+    def for_repo(cls, repo_id: str) -> "RunJournal":
+        return cls(
+            os.path.join(
+                get_cache_dir(), f"run-journal-{repo_id.replace('/', '--')}.sqlite"
+            )
+        )
+
+    def _execute(self, query: str, parameters=()) -> sqlite3.Cursor:
+        with self.lock:
+            cursor = self.connection.execute(query, parameters)
+            self.connection.commit()
+            return cursor
+
+    def _executemany(self, query: str, parameters: Iterable) -> None:
+        with self.lock:
+            self.connection.executemany(query, parameters)
+            self.connection.commit()
+
+    def add_pending(self, subfolders: Iterable[str]) -> None:
+        """
+        Records benchmarks that are planned, leaving the ones already known untouched.
+        """
+        self._executemany(
+            "INSERT OR IGNORE INTO benchmarks (subfolder, state) VALUES (?, ?)",
+            ((subfolder, PENDING) for subfolder in subfolders),
+        )
+
+    def start(self, subfolder: str) -> None:
+        self._execute(
+            "INSERT INTO benchmarks (subfolder, state, pid, started_at) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(subfolder) DO UPDATE SET state = excluded.state, pid = excluded.pid, "
+            "started_at = excluded.started_at, ended_at = NULL, error = NULL",
+            (subfolder, RUNNING, os.getpid(), time.time()),
+        )
+
+    def finish(self, subfolder: str, error: Optional[str] = None) -> None:
+        self._execute(
+            "UPDATE benchmarks SET state = ?, ended_at = ?, error = ? WHERE subfolder = ?",
+            (DONE if error is None else FAILED, time.time(), error, subfolder),
+        )
+
+    def skip(self, subfolder: str) -> None:
+        self._execute(
+            "INSERT INTO benchmarks (subfolder, state) VALUES (?, ?) "
+            "ON CONFLICT(subfolder) DO UPDATE SET state = excluded.state, pid = NULL, "
+            "error = NULL",
+            (subfolder, SKIPPED),
+        )
+
+    def mark_pushed(self, subfolders: Iterable[str]) -> None:
+        self._executemany(
+            "UPDATE benchmarks SET state = ? WHERE subfolder = ? AND state IN (?, ?)",
+            ((PUSHED, subfolder, DONE, FAILED) for subfolder in subfolders),
+        )
+
+    def requeue_interrupted(self) -> int:
+        """
+        Puts back to pending the benchmarks whose process died before they were pushed:
+        orphaned running ones, and done or failed ones whose upload was lost.
+
+        Returns:
+            int: The number of requeued benchmarks.
+        """
+        rows = self._execute(
+            "SELECT subfolder, pid FROM benchmarks WHERE state IN (?, ?, ?)",
+            (RUNNING, DONE, FAILED),
+        ).fetchall()
+        interrupted = [
+            (PENDING, subfolder)
+            for subfolder, pid in rows
+            if not _is_process_alive(pid)
+        ]
+        self._executemany(
+            "UPDATE benchmarks SET state = ?, pid = NULL WHERE subfolder = ?",
+            interrupted,
+        )
+        return len(interrupted)
+
+    def import_completion_index(
+        self, completion_index: BenchmarkCompletionIndex
+    ) -> None:
+        """
+        Reconciles the journal with the reports found in the remote repo.
+        """
+        self._executemany(
+            "INSERT INTO benchmarks (subfolder, state, error) VALUES (?, ?, ?) "
+            "ON CONFLICT(subfolder) DO UPDATE SET state = excluded.state, error = excluded.error "
+            "WHERE benchmarks.state != ?",
+            (
+                (
+                    subfolder,
+                    SKIPPED
+                    if completion_index.get_skip_reason(subfolder) is not None
+                    else PUSHED,
+                    completion_index.get_traceback(subfolder),
+                    RUNNING,
+                )
+                for subfolder in completion_index.statuses
+            ),
+        )
+
+    def get_state(self, subfolder: str) -> Optional[str]:
+        row = self._execute(
+            "SELECT state FROM benchmarks WHERE subfolder = ?", (subfolder,)
+        ).fetchone()
+        return row[0] if row is not None else None
+
+    def get_error(self, subfolder: str) -> Optional[str]:
+        row = self._execute(
+            "SELECT error FROM benchmarks WHERE subfolder = ?", (subfolder,)
+        ).fetchone()
+        return row[0] if row is not None else None
+
+    def get_durations(self) -> Dict[str, float]:
+        """
+        Returns the durations in seconds of the benchmarks that succeeded, by subfolder.
+        """
+        return dict(
+            self._execute(
+                "SELECT subfolder, ended_at - started_at FROM benchmarks "
+                "WHERE ended_at IS NOT NULL AND error IS NULL"
+            ).fetchall()
+        )
+
+    def is_conducted(self, subfolder: str) -> bool:
+        row = self._execute(
+            "SELECT state, error FROM benchmarks WHERE subfolder = ?", (subfolder,)
+        ).fetchone()
+        return row is not None and row[0] == PUSHED and row[1] is None
+
+    def count_by_state(self):
+        return dict(
+            self._execute(
+                "SELECT state, COUNT(*) FROM benchmarks GROUP BY state"
+            ).fetchall()
+        )
+
+    def __contains__(self, subfolder: str) -> bool:
+        return self.get_state(subfolder) is not None
+
+    def __len__(self) -> int:
+        return self._execute("SELECT COUNT(*) FROM benchmarks").fetchone()[0]
+
+    def close(self) -> None:
+        with self.lock:
+            self.connection.close()
@@ -0,0 +1,230 @@
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field
+from logging import getLogger
+from multiprocessing import get_context
+from queue import Queue
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from optimum_benchmark import Benchmark, BenchmarkConfig, BenchmarkReport
+
+from llm_perf.common.cpu_partition import partition_cpus
+from llm_perf.common.grouped_execution import launch_benchmark_group
+
+LOGGER = getLogger("llm-perf-backend")
+
+
+@dataclass
+class ExecutionSlot:
+    """
+    A share of the machine on which one benchmark runs at a time.
+
+    Every slot is backed by its own long-lived worker process, started with the slot's
+    environment and cpu affinity, from which the benchmarks of that slot are launched.
+    The isolated benchmark processes inherit both.
+    """
+
+    name: str
+    cpus: Optional[List[int]] = None
+    numa_node: Optional[int] = None
+    device_ids: Optional[str] = None
+    env: Dict[str, str] = field(default_factory=dict)
+
+
+def get_cpu_execution_slots(num_slots: int) -> List[ExecutionSlot]:
+    """
+    Splits the machine into `num_slots` disjoint cpu sets, one per execution slot,
+    and caps the thread pools of each slot to the size of its cpu set.
+    """
+    slots = []
+    for i, partition in enumerate(partition_cpus(num_slots)):
+        num_threads = str(len(partition.cpus))
+        slots.append(
+            ExecutionSlot(
+                name=f"cpu-{i}",
+                cpus=partition.cpus,
+                numa_node=partition.numa_node,
+                env={"OMP_NUM_THREADS": num_threads, "MKL_NUM_THREADS": num_threads},
+            )
+        )
+    return slots
+
+
+def discover_gpu_devices() -> List[str]:
+    """
+    Returns the ids of the GPUs of this machine, enumerated through NVML, which numbers
+    them in PCI bus order like `CUDA_DEVICE_ORDER=PCI_BUS_ID`.
+    """
+    import pynvml
+
+    pynvml.nvmlInit()
+    try:
+        return [str(index) for index in range(pynvml.nvmlDeviceGetCount())]
+    finally:
+        pynvml.nvmlShutdown()
+
+
+def get_gpu_execution_slots(
+    discover_devices: Callable[[], List[str]] = discover_gpu_devices,
+) -> List[ExecutionSlot]:
+    """
+    Creates one execution slot per GPU, each only seeing its own device.
+
+    Args:
+        discover_devices (Callable[[], List[str]]): Returns the ids of the devices to schedule on,
+            can be replaced to restrict the pool or to simulate devices.
+
+    Returns:
+        List[ExecutionSlot]: The list of execution slots.
+    """
+    return [
+        ExecutionSlot(
+            name=f"gpu-{device_id}",
+            device_ids=device_id,
+            env={"CUDA_DEVICE_ORDER": "PCI_BUS_ID", "CUDA_VISIBLE_DEVICES": device_id},
+        )
+        for device_id in discover_devices()
+    ]
+
+
+def _initialize_slot_worker(slot: ExecutionSlot):
+    os.environ.update(slot.env)
+    if slot.cpus is not None:
+        os.sched_setaffinity(0, slot.cpus)
+
+
+def _launch_benchmark(benchmark_config: BenchmarkConfig) -> Dict[str, Any]:
+    return Benchmark.launch(benchmark_config).to_dict()
+
+
+class SlotScheduler:
+    """
+    Runs benchmarks concurrently, one per execution slot.
+
+    The orchestration (config/report uploads, bookkeeping) stays in threads of the
+    main process, while `launch` sends each benchmark to the worker process of the
+    slot the calling thread currently holds.
+    """
+
+    def __init__(self, slots: List[ExecutionSlot], max_slot_failures: int = 3):
+        if not slots:
+            raise ValueError("SlotScheduler needs at least one execution slot")
+
+        self.slots = slots
+        self.max_slot_failures = max_slot_failures
+        self._slot_failures: Dict[str, int] = {slot.name: 0 for slot in slots}
+        self._executors: Dict[str, ProcessPoolExecutor] = {}
+        self._executors_lock = threading.Lock()
+        self._local = threading.local()
+
+    @property
+    def current_slot(self) -> Optional[ExecutionSlot]:
+        return getattr(self._local, "slot", None)
+
+    def _get_executor(self, slot: ExecutionSlot) -> ProcessPoolExecutor:
+        with self._executors_lock:
+            if slot.name not in self._executors:
+                self._executors[slot.name] = ProcessPoolExecutor(
+                    max_workers=1,
+                    mp_context=get_context("spawn"),
+                    initializer=_initialize_slot_worker,
+                    initargs=(slot,),
+                )
+            return self._executors[slot.name]
+
+    def _discard_executor(self, slot: ExecutionSlot):
+        with self._executors_lock:
+            executor = self._executors.pop(slot.name, None)
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _submit(self, fn: Callable[[Any], Any], arg: Any) -> Any:
+        slot = self.current_slot
+        if slot is None:
+            raise RuntimeError(
+                "SlotScheduler.launch called outside of a scheduled task"
+            )
+
+        try:
+            result = self._get_executor(slot).submit(fn, arg).result()
+        except BrokenProcessPool:
+            # the worker died (e.g. killed by the OOM killer), the next benchmark gets a fresh one
+            self._discard_executor(slot)
+            self._slot_failures[slot.name] += 1
+            raise
+
+        self._slot_failures[slot.name] = 0
+        return result
+
+    def launch(self, benchmark_config: BenchmarkConfig) -> BenchmarkReport:
+        """
+        Launches a benchmark in the worker process of the slot held by the calling thread.
+        """
+        return BenchmarkReport.from_dict(
+            self._submit(_launch_benchmark, benchmark_config)
+        )
+
+    def launch_group(
+        self, benchmark_configs: List[BenchmarkConfig]
+    ) -> List[Dict[str, Any]]:
+        """
+        Launches a group of benchmarks from the worker process of the slot held by the
+        calling thread, see `launch_benchmark_group`.
+        """
+        return self._submit(launch_benchmark_group, benchmark_configs)
+
+    def is_slot_healthy(self, slot: ExecutionSlot) -> bool:
+        return self._slot_failures[slot.name] < self.max_slot_failures
+
+    def run(self, task: Callable[[Any], None], items: Iterable[Any]):
+        """
+        Calls `task` on every item, running as many items concurrently as there are slots.
+        """
+        free_slots: Queue = Queue()
+        for slot in self.slots:
+            free_slots.put(slot)
+        healthy_slots = len(self.slots)
+        healthy_slots_lock = threading.Lock()
+
+        def run_in_slot(item):
+            nonlocal healthy_slots
+
+            slot = free_slots.get()
+            if slot is None:
+                # all slots were retired, wake up the next waiting task as well
+                free_slots.put(None)
+                raise RuntimeError("No healthy execution slot left to run on")
+
+            self._local.slot = slot
+            try:
+                task(item)
+            finally:
+                self._local.slot = None
+                if self.is_slot_healthy(slot):
+                    free_slots.put(slot)
+                else:
+                    LOGGER.error(
+                        f"Retiring execution slot {slot.name} after "
+                        f"{self._slot_failures[slot.name]} consecutive worker crashes"
+                    )
+                    self._discard_executor(slot)
+                    with healthy_slots_lock:
+                        healthy_slots -= 1
+                        if healthy_slots == 0:
+                            free_slots.put(None)
+
+        try:
+            with ThreadPoolExecutor(max_workers=len(self.slots)) as pool:
+                futures = [pool.submit(run_in_slot, item) for item in items]
+                for future in as_completed(futures):
+                    future.result()
+        finally:
+            self.shutdown()
+
+    def shutdown(self):
+        with self._executors_lock:
+            executors, self._executors = list(self._executors.values()), {}
+        for executor in executors:
+            executor.shutdown(wait=True)
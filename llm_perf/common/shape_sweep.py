@@ -0,0 +1,52 @@
+from typing import Callable, List, Optional
+
+# bisection stops once the gap between the largest fitting and the smallest failing
+# batch size is below this fraction of the largest fitting one
+BISECTION_RESOLUTION = 0.125
+
+
+def find_max_batch_size(
+    batch_sizes: List[int],
+    fits: Callable[[int], Optional[bool]],
+    resolution: float = BISECTION_RESOLUTION,
+) -> int:
+    """
+    Finds the largest batch size that fits in memory.
+
+    The given batch sizes are tried in increasing order until one runs out of memory,
+    then the gap between the last one that fitted and the one that did not is bisected.
+
+    Args:
+        batch_sizes (List[int]): The batch sizes of the sweep, every one that fits is run.
+        fits (Callable[[int], Optional[bool]]): Runs the benchmark at a batch size and returns
+            whether it fitted, or None if it failed for another reason, which ends the search.
+        resolution (float): Relative precision of the bisection.
+
+    Returns:
+        int: The largest batch size that fitted, 0 if none did.
+    """
+    largest_fitting, smallest_failing = 0, None
+    for batch_size in sorted(set(batch_sizes)):
+        result = fits(batch_size)
+        if result is None:
+            return largest_fitting
+        if not result:
+            smallest_failing = batch_size
+            break
+        largest_fitting = batch_size
+
+    if smallest_failing is None:
+        # everything fitted, the largest batch size is only a lower bound
+        return largest_fitting
+
+    while smallest_failing - largest_fitting > max(1, resolution * largest_fitting):
+        batch_size = (largest_fitting + smallest_failing) // 2
+        result = fits(batch_size)
+        if result is None:
+            break
+        if result:
+            largest_fitting = batch_size
+        else:
+            smallest_failing = batch_size
+
+    return largest_fitting
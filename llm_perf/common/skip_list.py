@@ -0,0 +1,167 @@
+import os
+import re
+import threading
+import time
+from logging import getLogger
+from typing import Any, Dict, Optional
+
+from optimum_benchmark import BenchmarkConfig
+
+from llm_perf.common.cache import read_json, write_json
+from llm_perf.common.dependency import get_cache_dir
+
+LOGGER = getLogger("llm-perf-backend")
+
+TRANSIENT = "transient"
+DETERMINISTIC = "deterministic"
+UNKNOWN = "unknown"
+
+# failures that depend on the state of the machine or of the network, worth retrying
+TRANSIENT_PATTERNS = [
+    r"out of memory",
+    r"OutOfMemoryError",
+    r"MemoryError",
+    r"Isolated process exited with non-zero code",
+    r"Isolated process did not send any response",
+    r"BrokenProcessPool",
+    r"ConnectionError",
+    r"ConnectTimeout",
+    r"ReadTimeout",
+    r"TimeoutError",
+    r"Temporary failure in name resolution",
+    r"Max retries exceeded",
+    r"HTTPError: 5\d\d",
+    r"\b(429|500|502|503|504)\b.*(Server Error|Too Many Requests)",
+    r"CUDA error: (an illegal memory access|unspecified launch failure)",
+    r"No space left on device",
+]
+
+# failures caused by the inputs or the model not fitting in memory
+OUT_OF_MEMORY_PATTERNS = [
+    r"out of memory",
+    r"OutOfMemoryError",
+    r"MemoryError",
+    # the isolated process was killed by the OOM killer
+    r"Isolated process exited with non-zero code -9",
+]
+
+# failures that come from the combination of an architecture and a configuration,
+# they happen again on every run until the libraries change; only known
+# incompatibility messages, since a match skips the config for the whole architecture
+DETERMINISTIC_PATTERNS = [
+    r"does not support an attention implementation through torch\.nn\.functional\.scaled_dot_product_attention",
+    r"does not support Flash Attention 2",
+    r"FlashAttention only supports",
+    r"flash_attn.* is not installed",
+    r"GPTQ.*(not supported|unsupported)",
+    r"AWQ.*(not supported|unsupported)",
+    r"(exllama|marlin).*(not supported|unsupported|requires)",
+    r"is not supported for (the )?export",
+    r"is not supported yet with ONNX",
+    r"Unrecognized configuration class",
+]
+
+
+def classify_failure(traceback: str) -> str:
+    """
+    Classifies the traceback of a failed benchmark as transient (worth retrying),
+    deterministic (fails again with the same architecture, config and libraries) or
+    unknown (retried like a transient failure).
+    """
+    if any(re.search(pattern, traceback) for pattern in TRANSIENT_PATTERNS):
+        return TRANSIENT
+    if any(
+        re.search(pattern, traceback, flags=re.IGNORECASE)
+        for pattern in DETERMINISTIC_PATTERNS
+    ):
+        return DETERMINISTIC
+    return UNKNOWN
+
+
+def is_out_of_memory(traceback: str) -> bool:
+    return any(
+        re.search(pattern, traceback, flags=re.IGNORECASE)
+        for pattern in OUT_OF_MEMORY_PATTERNS
+    )
+
+
+def _last_line(traceback: str) -> str:
+    lines = [line for line in traceback.strip().splitlines() if line.strip()]
+    return lines[-1].strip() if lines else ""
+
+
+def _library_versions(environment: Dict[str, Any]) -> Dict[str, str]:
+    return {
+        key: str(value)
+        for key, value in sorted(environment.items())
+        if key.endswith("_version")
+    }
+
+
+class FailureSkipList:
+    """
+    Local list of the (architecture, config) combinations that failed deterministically.
+
+    An entry only applies with the library versions it was recorded with, so that a
+    library upgrade gives every combination another chance.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.entries: Dict[str, Dict] = read_json(path) or {}
+        self.lock = threading.Lock()
+
+    @classmethod
+    def for_repo(cls, repo_id: str) -> "FailureSkipList":
+        return cls(
+            os.path.join(
+                get_cache_dir(), f"skip-list-{repo_id.replace('/', '--')}.json"
+            )
+        )
+
+    @staticmethod
+    def get_key(benchmark_config: BenchmarkConfig) -> str:
+        return f"{benchmark_config.backend.model_type}/{benchmark_config.name}"
+
+    def get_reason(self, benchmark_config: BenchmarkConfig) -> Optional[str]:
+        """
+        Returns why the benchmark is expected to fail, or None if it should run.
+        """
+        entry = self.entries.get(self.get_key(benchmark_config))
+        if entry is None or entry["versions"] != _library_versions(
+            benchmark_config.environment
+        ):
+            return None
+        return f"{entry['reason']} (seen with {entry['model']})"
+
+    def add(
+        self,
+        benchmark_config: BenchmarkConfig,
+        traceback: str,
+        environment: Optional[Dict[str, Any]] = None,
+    ):
+        """
+        Records a deterministic failure of the benchmark's architecture and config.
+
+        Args:
+            benchmark_config (BenchmarkConfig): The config of the failed benchmark.
+            traceback (str): The traceback of the failure.
+            environment (Dict[str, Any], optional): The environment the failure happened in,
+                defaults to the environment of `benchmark_config`.
+        """
+        key = self.get_key(benchmark_config)
+        environment = (
+            benchmark_config.environment if environment is None else environment
+        )
+        with self.lock:
+            self.entries[key] = {
+                "model": benchmark_config.backend.model,
+                "reason": _last_line(traceback),
+                "versions": _library_versions(environment),
+                "failed_at": time.time(),
+            }
+            write_json(self.path, self.entries)
+        LOGGER.info(f"Added {key} to the skip list {self.path}")
+
+    def __len__(self) -> int:
+        return len(self.entries)
@@ -0,0 +1,155 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Tuple
+
+import psutil
+
+
+@dataclass
+class Span:
+    name: str
+    start: float
+    duration: float
+    thread: str
+    args: Dict[str, Any] = field(default_factory=dict)
+
+
+class Tracer:
+    """
+    Records the spans of the orchestration phases of a run (listing models, checking
+    what was conducted, pushing configs, launching benchmarks, uploading reports) and
+    the RSS of the main process at the end of every span.
+
+    Spans can be nested and recorded from several threads. Times are relative to the
+    creation of the tracer.
+    """
+
+    def __init__(self):
+        self.origin = time.perf_counter()
+        self.process = psutil.Process()
+        self.lock = threading.Lock()
+        self.spans: List[Span] = []
+        self.rss_samples: List[Tuple[float, int]] = [(0.0, self.get_rss())]
+
+    def get_rss(self) -> int:
+        return self.process.memory_info().rss
+
+    @contextmanager
+    def span(self, name: str, **args):
+        """
+        Records the duration of the enclosed block, can also decorate a function.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            rss = self.get_rss()
+            span = Span(
+                name=name,
+                start=start - self.origin,
+                duration=end - start,
+                thread=threading.current_thread().name,
+                args=args,
+            )
+            with self.lock:
+                self.spans.append(span)
+                self.rss_samples.append((end - self.origin, rss))
+
+    def summarize(self) -> List[Dict[str, Any]]:
+        """
+        Aggregates the spans by name, longest total first. Nested spans are counted in
+        their own phase and in the enclosing one.
+        """
+        with self.lock:
+            spans = list(self.spans)
+
+        phases: Dict[str, Dict[str, Any]] = {}
+        for span in spans:
+            phase = phases.setdefault(
+                span.name, {"name": span.name, "count": 0, "total": 0.0, "max": 0.0}
+            )
+            phase["count"] += 1
+            phase["total"] += span.duration
+            phase["max"] = max(phase["max"], span.duration)
+        for phase in phases.values():
+            phase["mean"] = phase["total"] / phase["count"]
+        return sorted(phases.values(), key=lambda phase: phase["total"], reverse=True)
+
+    def format_summary(self) -> str:
+        elapsed = time.perf_counter() - self.origin
+        with self.lock:
+            rss = [rss for _, rss in self.rss_samples]
+        lines = [
+            f"{'phase':<32}{'count':>8}{'total (s)':>12}{'mean (s)':>12}{'max (s)':>12}{'% wall':>8}"
+        ]
+        for phase in self.summarize():
+            lines.append(
+                f"{phase['name']:<32}{phase['count']:>8}{phase['total']:>12.2f}"
+                f"{phase['mean']:>12.3f}{phase['max']:>12.3f}"
+                f"{100 * phase['total'] / elapsed:>8.1f}"
+            )
+        lines.append(
+            f"Wall-clock {elapsed:.1f}s, main process RSS {rss[0] / 2**20:.0f}MB at start, "
+            f"{max(rss) / 2**20:.0f}MB at peak, {rss[-1] / 2**20:.0f}MB at end"
+        )
+        return "\n".join(lines)
+
+    def to_chrome_trace(self) -> Dict[str, Any]:
+        """
+        Converts the spans and RSS samples to the Chrome trace event format, which can be
+        opened in chrome://tracing or https://ui.perfetto.dev.
+        """
+        pid = os.getpid()
+        with self.lock:
+            spans, rss_samples = list(self.spans), list(self.rss_samples)
+
+        thread_ids: Dict[str, int] = {}
+        events = []
+        for span in spans:
+            tid = thread_ids.setdefault(span.thread, len(thread_ids))
+            events.append(
+                {
+                    "name": span.name,
+                    "ph": "X",
+                    "ts": span.start * 1e6,
+                    "dur": span.duration * 1e6,
+                    "pid": pid,
+                    "tid": tid,
+                    "args": {key: str(value) for key, value in span.args.items()},
+                }
+            )
+        for thread, tid in thread_ids.items():
+            events.append(
+                {
+                    "name": "thread_name",
+                    "ph": "M",
+                    "pid": pid,
+                    "tid": tid,
+                    "args": {"name": thread},
+                }
+            )
+        for timestamp, rss in rss_samples:
+            events.append(
+                {
+                    "name": "rss",
+                    "ph": "C",
+                    "ts": timestamp * 1e6,
+                    "pid": pid,
+                    "args": {"MB": rss / 2**20},
+                }
+            )
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def export(self, path: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(self.to_chrome_trace(), f)
+
+
+# tracer of the current process, shared by the modules that record spans
+TRACER = Tracer()
@@ -0,0 +1,204 @@
+import json
+import os
+import signal
+import threading
+import time
+from logging import getLogger
+from queue import Empty, Queue
+from typing import Callable, List, Optional, Tuple
+
+from huggingface_hub import CommitOperationAdd, HfApi
+
+REPO_TYPE = "dataset"
+
+LOGGER = getLogger("llm-perf-backend")
+
+
+class BenchmarkUploader:
+    """
+    Uploads benchmark artifacts from a background thread, grouping the artifacts of
+    many benchmarks into a few multi-file commits.
+
+    Artifacts are serialized when they are added, so the caller can move on to the next
+    benchmark right away. A batch is committed once it holds `max_batch_size` files,
+    once `flush_interval` seconds went by since its first file, or when a flush is
+    requested. Failed commits are retried with exponential backoff.
+
+    `repo_id` is either a Hub repo id or an existing local directory, in which case
+    the artifacts are written to that directory instead. `on_commit` is called from the
+    background thread with the paths of every successful commit.
+    """
+
+    def __init__(
+        self,
+        repo_id: str,
+        private: bool = True,
+        max_batch_size: int = 64,
+        flush_interval: float = 60.0,
+        max_retries: int = 5,
+        backoff: float = 2.0,
+        on_commit: Optional[Callable[[List[str]], None]] = None,
+    ):
+        self.repo_id = repo_id
+        self.private = private
+        self.max_batch_size = max_batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.on_commit = on_commit
+
+        self.is_local = os.path.isdir(repo_id)
+        self.api = None if self.is_local else HfApi()
+        self.repo_created = False
+
+        self.queue: Queue = Queue()
+        self.flush_requested = threading.Event()
+        self.closed = threading.Event()
+        self.thread = threading.Thread(
+            target=self._run, name="benchmark-uploader", daemon=True
+        )
+        self.thread.start()
+
+    def add(self, artifact, subfolder: str, filename: Optional[str] = None):
+        """
+        Queues an artifact (a benchmark config, report or benchmark) for upload.
+        """
+        if self.closed.is_set():
+            raise RuntimeError("Cannot add artifacts to a closed uploader")
+
+        path_in_repo = f"{subfolder}/{filename or artifact.default_filename}"
+        content = json.dumps(artifact.to_dict(), indent=4).encode()
+        self.queue.put((path_in_repo, content))
+
+    def request_flush(self):
+        """
+        Asks the background thread to commit what it holds without waiting for the batch to fill.
+        """
+        self.flush_requested.set()
+
+    def flush(self, timeout: Optional[float] = None):
+        """
+        Blocks until every artifact added so far has been committed (or given up on).
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.queue.unfinished_tasks > 0:
+            self.request_flush()
+            if deadline is not None and time.monotonic() > deadline:
+                LOGGER.warning(
+                    f"Uploader flush timed out with {self.queue.unfinished_tasks} artifacts pending"
+                )
+                return
+            time.sleep(0.1)
+
+    def close(self, timeout: Optional[float] = None):
+        self.flush(timeout=timeout)
+        self.closed.set()
+        self.thread.join(timeout=timeout)
+
+    def install_signal_handlers(self):
+        """
+        Flushes pending uploads on SIGUSR1, and before exiting on SIGTERM.
+        Only has an effect when called from the main thread.
+        """
+        if threading.current_thread() is not threading.main_thread():
+            return
+
+        def on_sigusr1(signum, frame):
+            self.request_flush()
+
+        def on_sigterm(signum, frame):
+            LOGGER.warning("Received SIGTERM, flushing pending uploads before exiting")
+            self.close(timeout=self.flush_interval)
+            raise SystemExit(128 + signum)
+
+        signal.signal(signal.SIGUSR1, on_sigusr1)
+        signal.signal(signal.SIGTERM, on_sigterm)
+
+    def _run(self):
+        batch: List[Tuple[str, bytes]] = []
+        batch_started = None
+
+        while True:
+            try:
+                batch.append(self.queue.get(timeout=0.5))
+                if batch_started is None:
+                    batch_started = time.monotonic()
+            except Empty:
+                if self.closed.is_set() and not batch:
+                    return
+
+            if not batch:
+                self.flush_requested.clear()
+                continue
+
+            is_due = (
+                len(batch) >= self.max_batch_size
+                or time.monotonic() - batch_started >= self.flush_interval
+                or self.flush_requested.is_set()
+                or self.closed.is_set()
+            )
+            if is_due:
+                while len(batch) < self.max_batch_size:
+                    try:
+                        batch.append(self.queue.get_nowait())
+                    except Empty:
+                        break
+                self._commit_with_retries(batch)
+                for _ in batch:
+                    self.queue.task_done()
+                batch, batch_started = [], None
+
+    def _commit_with_retries(self, batch: List[Tuple[str, bytes]]):
+        # the last version of a file wins when it was queued several times
+        files = dict(batch)
+
+        for attempt in range(self.max_retries + 1):
+            try:
+                self._commit(files)
+                LOGGER.info(f"Uploaded {len(files)} files to {self.repo_id}")
+                if self.on_commit is not None:
+                    try:
+                        self.on_commit(sorted(files))
+                    except Exception as e:
+                        LOGGER.error(f"Commit callback failed, error:\n{e}")
+                return
+            except Exception as e:
+                if attempt == self.max_retries:
+                    LOGGER.error(
+                        f"Giving up on uploading {len(files)} files to {self.repo_id} "
+                        f"after {attempt + 1} attempts: {sorted(files)}, error:\n{e}"
+                    )
+                    return
+                delay = self.backoff**attempt
+                LOGGER.warning(
+                    f"Upload to {self.repo_id} failed, retrying in {delay:.0f}s, error:\n{e}"
+                )
+                time.sleep(delay)
+
+    def _commit(self, files):
+        if self.is_local:
+            for path_in_repo, content in files.items():
+                path = os.path.join(self.repo_id, path_in_repo)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path, "wb") as f:
+                    f.write(content)
+            return
+
+        if not self.repo_created:
+            self.api.create_repo(
+                repo_id=self.repo_id,
+                repo_type=REPO_TYPE,
+                private=self.private,
+                exist_ok=True,
+            )
+            self.repo_created = True
+
+        self.api.create_commit(
+            repo_id=self.repo_id,
+            repo_type=REPO_TYPE,
+            operations=[
+                CommitOperationAdd(path_in_repo=path_in_repo, path_or_fileobj=content)
+                for path_in_repo, content in files.items()
+            ],
+            commit_message=f"Upload {len(files)} benchmark files",
+        )
@@ -1,26 +1,85 @@
-import pandas as pd
+import json
+import os
+import tempfile
+import time
+from functools import lru_cache
+from typing import Dict, List
 
-from llm_perf.common.dependency import get_benchmark_top_n, is_debug_mode
+from llm_perf.common.cache import get_cached_value, read_json
+from llm_perf.common.cost_model import estimate_num_parameters, load_model_config
+from llm_perf.common.dependency import (
+    get_benchmark_top_n,
+    get_model_list_file,
+    is_debug_mode,
+)
+from llm_perf.common.tracing import TRACER
 
 INPUT_SHAPES = {"batch_size": 1, "sequence_length": 256}
 GENERATE_KWARGS = {"max_new_tokens": 64, "min_new_tokens": 64}
 
-
-OPEN_LLM_LEADERBOARD = pd.read_csv(
+OPEN_LLM_LEADERBOARD_URL = (
     "hf://datasets/optimum-benchmark/llm-perf-leaderboard/llm-df.csv"
 )
-OPEN_LLM_LIST = OPEN_LLM_LEADERBOARD.drop_duplicates(subset=["Model"])["Model"].tolist()
-PRETRAINED_OPEN_LLM_LIST = (
-    OPEN_LLM_LEADERBOARD[OPEN_LLM_LEADERBOARD["Type"] == "pretrained"]
-    .drop_duplicates(subset=["Model"])["Model"]
-    .tolist()
-)
+
+
+@lru_cache(maxsize=None)
+def get_open_llm_leaderboard():
+    """
+    Loads the open-llm leaderboard dataframe, on first use only.
+    """
+    import pandas as pd
+
+    return pd.read_csv(OPEN_LLM_LEADERBOARD_URL)
+
+
+def _fetch_open_llm_lists() -> Dict[str, List[str]]:
+    open_llm_leaderboard = get_open_llm_leaderboard()
+    pretrained_open_llm_leaderboard = open_llm_leaderboard[
+        open_llm_leaderboard["Type"] == "pretrained"
+    ]
+    return {
+        "open_llm_list": open_llm_leaderboard.drop_duplicates(subset=["Model"])[
+            "Model"
+        ].tolist(),
+        "pretrained_open_llm_list": pretrained_open_llm_leaderboard.drop_duplicates(
+            subset=["Model"]
+        )["Model"].tolist(),
+    }
+
+
+@lru_cache(maxsize=None)
+def get_open_llm_list() -> list[str]:
+    return get_cached_value("open-llm-lists", _fetch_open_llm_lists)["open_llm_list"]
+
+
+@lru_cache(maxsize=None)
+def get_pretrained_open_llm_list() -> list[str]:
+    return get_cached_value("open-llm-lists", _fetch_open_llm_lists)[
+        "pretrained_open_llm_list"
+    ]
+
+
+def _fetch_top_text_generation_models() -> list[str]:
+    from datasets import load_dataset
+
+    ds = load_dataset("optimum-benchmark/top-text-generation-models")
+
+    # Get the data from the dataset
+    models_data = ds["train"].to_pandas().to_dict("records")
+
+    # sort by downloads
+    models_data = sorted(models_data, key=lambda x: x["downloads"], reverse=True)
+
+    return [f"{model['organization']}/{model['model_name']}" for model in models_data]
 
 
 def get_top_llm_list(n: int = 10) -> list[str]:
     """
     Fetches the top n text generation models from the Hugging Face dataset.
 
+    The sorted list of models is kept in the on-disk cache, so that only the first call
+    after the cache expired pays for the download.
+
     Args:
         n (int): Number of top models to retrieve. Defaults to 10.
 
@@ -28,33 +87,92 @@ def get_top_llm_list(n: int = 10) -> list[str]:
         list: A list of strings representing the top n models in the format "organization/model_name".
     """
     try:
-        # Download the dataset from the Hugging Face Hub
-        from datasets import load_dataset
+        top_models = get_cached_value(
+            "top-text-generation-models", _fetch_top_text_generation_models
+        )
+    except Exception as e:
+        raise RuntimeError(f"Error fetching top LLM list: {e}") from e
 
-        ds = load_dataset("optimum-benchmark/top-text-generation-models")
+    return top_models[:n]
 
-        # Get the data from the dataset
-        models_data = ds["train"].to_pandas().to_dict("records")
 
-        # sort by downloads
-        models_data = sorted(models_data, key=lambda x: x["downloads"], reverse=True)
+def _get_num_parameters(models: list[str]) -> dict[str, float]:
+    num_parameters = {}
+    for model in models:
+        model_config = load_model_config(model)
+        if model_config is not None:
+            num_parameters[model] = estimate_num_parameters(model_config)
+    return {model: count for model, count in num_parameters.items() if count}
 
-        # Create the list of top models
-        top_models = [
-            f"{model['organization']}/{model['model_name']}"
-            for model in models_data[:n]
-        ]
 
-        return top_models
-    except Exception as e:
-        print(f"Error fetching top LLM list: {e}")
-        return []
+def _pin_model_list(model_list_file: str, models: list[str]) -> list[str]:
+    """
+    Writes the model list, with the parameter count of every model whose config could
+    be read, to `model_list_file` unless another process pinned it first, and returns
+    the pinned list.
+    """
+    directory = os.path.dirname(model_list_file) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(
+                {
+                    "models": models,
+                    "num_parameters": _get_num_parameters(models),
+                    "pinned_at": time.time(),
+                },
+                f,
+                indent=2,
+            )
+        # linking fails if the file exists, which makes the first writer win
+        os.link(tmp_path, model_list_file)
+    except FileExistsError:
+        pass
+    finally:
+        os.unlink(tmp_path)
+
+    return read_json(model_list_file)["models"]
+
 
+@lru_cache(maxsize=None)
+@TRACER.span("load_model_list")
+def get_canonical_pretrained_open_llm_list() -> list[str]:
+    """
+    Returns the list of models to benchmark, resolved on first use only.
+
+    When `MODEL_LIST_FILE` is set, the list is read from that file if it exists, and
+    the resolved list is written to it otherwise, so that every shard of a campaign
+    pointed at the same file benchmarks the exact same models.
+    """
+    if is_debug_mode():
+        return ["bigscience/bloomz-560m"]
+
+    model_list_file = get_model_list_file()
+    pinned = read_json(model_list_file) if model_list_file is not None else None
+
+    if pinned is not None:
+        canonical_pretrained_open_llm_list = pinned["models"]
+        print(f"Using the model list pinned in {model_list_file}")
+    else:
+        canonical_pretrained_open_llm_list = get_top_llm_list(n=get_benchmark_top_n())
+        if model_list_file is not None:
+            canonical_pretrained_open_llm_list = _pin_model_list(
+                model_list_file, canonical_pretrained_open_llm_list
+            )
+            print(f"Pinned the model list in {model_list_file}")
 
-if is_debug_mode():
-    CANONICAL_PRETRAINED_OPEN_LLM_LIST = ["bigscience/bloomz-560m"]
-else:
-    CANONICAL_PRETRAINED_OPEN_LLM_LIST = get_top_llm_list(n=get_benchmark_top_n())
     print(
-        f"Benchamrking the following {len(CANONICAL_PRETRAINED_OPEN_LLM_LIST)} models: {CANONICAL_PRETRAINED_OPEN_LLM_LIST}"
+        f"Benchamrking the following {len(canonical_pretrained_open_llm_list)} models: {canonical_pretrained_open_llm_list}"
     )
+    return canonical_pretrained_open_llm_list
+
+
+def get_pinned_num_parameters() -> dict[str, float]:
+    """
+    Returns the parameter counts recorded in `MODEL_LIST_FILE`, by model, so that every
+    shard of a campaign sees the same ones. Empty if no list was pinned.
+    """
+    model_list_file = get_model_list_file()
+    pinned = read_json(model_list_file) if model_list_file is not None else None
+    return (pinned or {}).get("num_parameters", {})
@@ -0,0 +1,119 @@
+import importlib.util
+import multiprocessing
+import time
+from dataclasses import dataclass, field
+from logging import getLogger
+from multiprocessing import forkserver, get_context
+from statistics import median
+from typing import Dict, List
+
+from optimum_benchmark.launchers.config import LauncherConfig
+from optimum_benchmark.launchers.process.config import ProcessConfig
+from optimum_benchmark.launchers.process.launcher import ProcessLauncher
+
+LOGGER = getLogger("llm-perf-backend")
+
+START_METHODS = ["spawn", "fork", "forkserver"]
+
+# imported once by the fork server instead of once per benchmark
+PRELOAD_MODULES = [
+    "torch",
+    "transformers",
+    "optimum_benchmark",
+    "optimum_benchmark.launchers.process.launcher",
+]
+BACKEND_PRELOAD_MODULES: Dict[str, List[str]] = {
+    "pytorch": [],
+    "onnxruntime": ["onnxruntime", "optimum.onnxruntime"],
+    "openvino": ["openvino", "optimum.intel"],
+}
+
+
+@dataclass
+class WarmProcessConfig(ProcessConfig):
+    """
+    Process launcher config that starts the isolated process of every benchmark from a
+    fork server, which imported the heavy libraries once. Every benchmark still runs in
+    its own fresh process, forked from the clean, single-threaded server process rather
+    than from the main process, so device isolation applies as with `ProcessConfig`.
+    """
+
+    _target_: str = "llm_perf.common.warm_process.WarmProcessLauncher"
+
+    start_method: str = "forkserver"
+    # modules imported by the fork server
+    preload: List[str] = field(default_factory=list)
+
+    def __post_init__(self):
+        # `ProcessConfig` does not accept the forkserver start method
+        LauncherConfig.__post_init__(self)
+
+        if self.start_method not in START_METHODS:
+            raise ValueError(
+                f"start_method must be one of {START_METHODS}, got {self.start_method}"
+            )
+
+
+class WarmProcessLauncher(ProcessLauncher):
+    def __init__(self, config: WarmProcessConfig):
+        # only has an effect before the fork server of this process is started
+        multiprocessing.set_forkserver_preload(config.preload)
+        super().__init__(config)
+
+
+def get_preload_modules(backend: str) -> List[str]:
+    """
+    The installed modules worth preloading for the benchmarks of a backend.
+    """
+    modules = PRELOAD_MODULES + BACKEND_PRELOAD_MODULES.get(backend, [])
+    return [
+        module
+        for module in modules
+        if importlib.util.find_spec(module.split(".")[0]) is not None
+    ]
+
+
+def _import_modules(modules: List[str]):
+    for module in modules:
+        importlib.import_module(module)
+
+
+def measure_startup_overhead(
+    start_method: str, modules: List[str], repeats: int = 3
+) -> float:
+    """
+    Measures the time it takes to start a process that imports the given modules, as
+    the isolated process of a benchmark does before measuring anything.
+
+    Returns:
+        float: The median start-up time in seconds.
+    """
+    context = get_context(start_method)
+    durations = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        process = context.Process(target=_import_modules, args=(modules,))
+        process.start()
+        process.join()
+        durations.append(time.perf_counter() - start)
+    return median(durations)
+
+
+def start_fork_server(modules: List[str], measure: bool = True) -> None:
+    """
+    Starts the fork server of the current process with the given modules preloaded,
+    and logs the start-up overhead of a benchmark process with and without it.
+    """
+    if measure:
+        spawn_overhead = measure_startup_overhead("spawn", modules, repeats=1)
+
+    multiprocessing.set_forkserver_preload(modules)
+    forkserver.ensure_running()
+    LOGGER.info(f"Started the fork server, preloading {modules}")
+
+    if measure:
+        forkserver_overhead = measure_startup_overhead("forkserver", modules)
+        LOGGER.info(
+            f"Start-up overhead of a benchmark process: {spawn_overhead:.2f}s with "
+            f"spawn, {forkserver_overhead:.2f}s from the fork server"
+        )
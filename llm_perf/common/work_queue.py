@@ -0,0 +1,278 @@
+import fcntl
+import json
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from dataclasses import dataclass
+from logging import getLogger
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple, Type
+
+LOGGER = getLogger("llm-perf-backend")
+
+PENDING = "pending"
+CLAIMED = "claimed"
+DONE = "done"
+FAILED = "failed"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    key TEXT PRIMARY KEY,
+    payload TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    state TEXT NOT NULL,
+    worker TEXT,
+    lease_expires_at REAL,
+    attempts INTEGER NOT NULL DEFAULT 0
+)
+"""
+
+
+@dataclass
+class Lease:
+    key: str
+    payload: Any
+    worker: str
+    expires_at: float
+
+
+class WorkQueue(ABC):
+    """
+    Queue of work items shared by several workers, which claim items one at a time
+    with an expiring lease. A worker renews the lease of its item while working on it,
+    so that the item goes back to the queue when the lease expires after a crash.
+
+    Items are identified by a key, adding an item that is already known is a no-op,
+    so that every worker can add the whole campaign.
+    """
+
+    def __init__(self, lease_duration: float = 300.0, max_attempts: int = 3):
+        self.lease_duration = lease_duration
+        # an item whose lease expired this many times is given up on, since it most
+        # likely crashes the workers that claim it
+        self.max_attempts = max_attempts
+
+    @abstractmethod
+    def add(self, items: Iterable[Tuple[str, Any]]) -> None:
+        """
+        Adds the (key, payload) items to the queue, in order, payloads must be JSON
+        serializable.
+        """
+
+    @abstractmethod
+    def claim(self, worker: str) -> Optional[Lease]:
+        """
+        Claims the first pending item, or one whose lease expired, None if there is none.
+        """
+
+    @abstractmethod
+    def renew(self, lease: Lease) -> bool:
+        """
+        Extends a lease, False if it was lost to another worker after expiring.
+        """
+
+    @abstractmethod
+    def complete(self, lease: Lease) -> None:
+        """
+        Marks the item of a lease as done.
+        """
+
+    @abstractmethod
+    def release(self, lease: Lease) -> None:
+        """
+        Returns the item of a lease to the queue, for another worker to claim.
+        """
+
+    @abstractmethod
+    def count_by_state(self) -> Dict[str, int]:
+        pass
+
+    def claim_or_wait(
+        self,
+        worker: str,
+        should_stop: Optional[Callable[[], bool]] = None,
+        min_interval: float = 5.0,
+        max_interval: float = 60.0,
+    ) -> Optional[Lease]:
+        """
+        Claims an item, polling with an exponential backoff while none is pending but
+        other workers hold leases, since the item of a crashed worker comes back once
+        its lease expires. Returns None once no item is pending or claimed, or when
+        `should_stop` returns True.
+        """
+        interval = min_interval
+        while True:
+            lease = self.claim(worker)
+            if lease is not None:
+                return lease
+            if not self.count_by_state().get(CLAIMED, 0):
+                return None
+            if should_stop is not None and should_stop():
+                return None
+            time.sleep(interval)
+            interval = min(2 * interval, max_interval)
+
+
+class SQLiteWorkQueue(WorkQueue):
+    """
+    Work queue in a SQLite database, which can live on storage shared by several
+    machines. Every operation is a short transaction taken under an exclusive lock of
+    a file next to the database, since SQLite's own locking is not reliable on network
+    file systems. Leases expire according to the clocks of the workers, which should
+    be synchronized (e.g. by NTP) to a small fraction of the lease duration.
+    """
+
+    def __init__(self, path: str, lease_duration: float = 300.0, max_attempts: int = 3):
+        super().__init__(lease_duration=lease_duration, max_attempts=max_attempts)
+        self.path = path
+        self.lock_path = f"{path}.lock"
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._transaction() as connection:
+            connection.execute(SCHEMA)
+
+    @contextmanager
+    def _transaction(self):
+        with open(self.lock_path, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                # a connection per transaction, so that nothing is cached between them
+                connection = sqlite3.connect(self.path, timeout=60)
+                try:
+                    with connection:
+                        yield connection
+                finally:
+                    connection.close()
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def add(self, items: Iterable[Tuple[str, Any]]) -> None:
+        with self._transaction() as connection:
+            offset = connection.execute(
+                "SELECT COALESCE(MAX(position) + 1, 0) FROM tasks"
+            ).fetchone()[0]
+            connection.executemany(
+                "INSERT OR IGNORE INTO tasks (key, payload, position, state) "
+                "VALUES (?, ?, ?, ?)",
+                (
+                    (key, json.dumps(payload), offset + position, PENDING)
+                    for position, (key, payload) in enumerate(items)
+                ),
+            )
+
+    def claim(self, worker: str) -> Optional[Lease]:
+        now = time.time()
+        with self._transaction() as connection:
+            # items that exhausted their attempts on crashed workers are given up on
+            connection.execute(
+                "UPDATE tasks SET state = ?, worker = NULL "
+                "WHERE state = ? AND lease_expires_at < ? AND attempts >= ?",
+                (FAILED, CLAIMED, now, self.max_attempts),
+            )
+            row = connection.execute(
+                "SELECT key, payload FROM tasks "
+                "WHERE state = ? OR (state = ? AND lease_expires_at < ?) "
+                "ORDER BY position LIMIT 1",
+                (PENDING, CLAIMED, now),
+            ).fetchone()
+            if row is None:
+                return None
+
+            key, payload = row
+            expires_at = now + self.lease_duration
+            connection.execute(
+                "UPDATE tasks SET state = ?, worker = ?, lease_expires_at = ?, "
+                "attempts = attempts + 1 WHERE key = ?",
+                (CLAIMED, worker, expires_at, key),
+            )
+        return Lease(
+            key=key, payload=json.loads(payload), worker=worker, expires_at=expires_at
+        )
+
+    def renew(self, lease: Lease) -> bool:
+        expires_at = time.time() + self.lease_duration
+        with self._transaction() as connection:
+            renewed = connection.execute(
+                "UPDATE tasks SET lease_expires_at = ? "
+                "WHERE key = ? AND state = ? AND worker = ?",
+                (expires_at, lease.key, CLAIMED, lease.worker),
+            ).rowcount
+        if renewed:
+            lease.expires_at = expires_at
+        return bool(renewed)
+
+    def complete(self, lease: Lease) -> None:
+        with self._transaction() as connection:
+            connection.execute(
+                "UPDATE tasks SET state = ?, lease_expires_at = NULL "
+                "WHERE key = ? AND worker = ?",
+                (DONE, lease.key, lease.worker),
+            )
+
+    def release(self, lease: Lease) -> None:
+        with self._transaction() as connection:
+            connection.execute(
+                "UPDATE tasks SET state = ?, worker = NULL, lease_expires_at = NULL, "
+                "attempts = attempts - 1 WHERE key = ? AND state = ? AND worker = ?",
+                (PENDING, lease.key, CLAIMED, lease.worker),
+            )
+
+    def count_by_state(self) -> Dict[str, int]:
+        with self._transaction() as connection:
+            return dict(
+                connection.execute(
+                    "SELECT state, COUNT(*) FROM tasks GROUP BY state"
+                ).fetchall()
+            )
+
+
+# work queue backends by URL scheme, a plain path is a SQLite database
+WORK_QUEUE_BACKENDS: Dict[str, Type[WorkQueue]] = {"sqlite": SQLiteWorkQueue}
+
+
+def open_work_queue(url: str, **kwargs) -> WorkQueue:
+    """
+    Opens a work queue from a URL such as `sqlite:///shared/campaign.sqlite`.
+    """
+    scheme, separator, location = url.partition("://")
+    if not separator:
+        scheme, location = "sqlite", url
+    if scheme not in WORK_QUEUE_BACKENDS:
+        raise ValueError(
+            f"Unknown work queue backend {scheme}, expected one of {list(WORK_QUEUE_BACKENDS)}"
+        )
+    return WORK_QUEUE_BACKENDS[scheme](location, **kwargs)
+
+
+class LeaseRenewer:
+    """
+    Renews a lease from a background thread for as long as the context is active.
+    """
+
+    def __init__(self, work_queue: WorkQueue, lease: Lease):
+        self.work_queue = work_queue
+        self.lease = lease
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(
+            target=self._run, name=f"lease-{lease.key}", daemon=True
+        )
+
+    def _run(self):
+        while not self.stopped.wait(self.work_queue.lease_duration / 3):
+            try:
+                if not self.work_queue.renew(self.lease):
+                    LOGGER.warning(
+                        f"Lost the lease of {self.lease.key}, another worker may run it"
+                    )
+                    return
+            except Exception as e:
+                LOGGER.warning(f"Could not renew the lease of {self.lease.key}: {e}")
+
+    def __enter__(self) -> "LeaseRenewer":
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stopped.set()
+        self.thread.join()
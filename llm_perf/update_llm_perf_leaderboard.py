@@ -1,13 +1,30 @@
+import hashlib
 import subprocess
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
 from glob import glob
+from multiprocessing import get_context
+from typing import List, Optional, Tuple
 import os
 
 import pandas as pd
-from huggingface_hub import create_repo, snapshot_download, upload_file, repo_exists
-from optimum_benchmark import Benchmark
+from huggingface_hub import (
+    create_repo,
+    hf_hub_download,
+    snapshot_download,
+    upload_file,
+    repo_exists,
+)
 import json
 
+from llm_perf.common.benchmark_flattener import BenchmarkColumns, read_flat_benchmark
 from llm_perf.common.hardware_config import load_hardware_configs
+from llm_perf.common.leaderboard_table import (
+    build_leaderboard_table,
+    write_leaderboard_table,
+)
+from llm_perf.common.perf_parquet import write_perf_parquet
+from llm_perf.common.regression import detect_regressions, summarize_regressions
 from huggingface_hub.utils import disable_progress_bars
 
 disable_progress_bars()
@@ -18,54 +35,112 @@ PERF_REPO_ID = "optimum-benchmark/llm-perf-{backend}-{hardware}-{subset}-{machin
 
 DATA_DIR = "data"
 PERF_DF = os.path.join(DATA_DIR, "perf-df-{backend}-{hardware}-{subset}-{machine}.csv")
+# typed columnar copy of the perf dataframe, for readers that only need a few columns
+PERF_PARQUET = os.path.join(
+    DATA_DIR, "perf-df-{backend}-{hardware}-{subset}-{machine}.parquet"
+)
 LLM_DF = os.path.join(DATA_DIR, "llm-df.csv")
+# all the perf dataframes joined with the llm dataframe, one row per model and config
+LEADERBOARD = os.path.join(DATA_DIR, "leaderboard.parquet")
+# significant changes of the metrics since the previously published perf dataframe
+REGRESSIONS = os.path.join(
+    DATA_DIR, "regressions-{backend}-{hardware}-{subset}-{machine}.csv"
+)
+# local bookkeeping of incremental runs, never uploaded
+STATE_DIR = os.path.join(DATA_DIR, "state")
+MANIFEST = os.path.join(
+    STATE_DIR, "manifest-{backend}-{hardware}-{subset}-{machine}.json"
+)
+ROWS = os.path.join(STATE_DIR, "rows-{backend}-{hardware}-{subset}-{machine}.pkl")
+SOURCE_COLUMN = "_source"
 
 # Create data directory if it doesn't exist
 os.makedirs(DATA_DIR, exist_ok=True)
 
 
-def patch_json(file):
+def get_file_key(file: str) -> str:
     """
-    Patch a JSON file by adding a 'stdev_' key with the same value as 'stdev' for all occurrences,
-    but only if 'stdev_' doesn't already exist at the same level.
-    This is to make the old optimum benchmark compatible with the new one.
+    Returns a key that changes whenever the content of a snapshot file changes.
 
-    This function reads a JSON file, recursively traverses the data structure,
-    and for each dictionary that contains a 'stdev' key without a corresponding 'stdev_' key,
-    it adds a 'stdev_' key with the same value. The modified data is then written back to the file.
+    Snapshot files are symlinks to blobs named after their content hash, so the blob
+    name is used when available, avoiding to read the file at all.
+    """
+    if os.path.islink(file):
+        return os.path.basename(os.path.realpath(file))
+    with open(file, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
 
-    Args:
-        file (str): The path to the JSON file to be patched.
 
-    Returns:
-        None
+def load_gather_state(manifest_file: str, rows_file: str):
     """
-    with open(file, "r") as f:
-        data = json.load(f)
-
-    def add_stdev_(obj):
-        if isinstance(obj, dict):
-            new_items = []
-            for key, value in obj.items():
-                if key == "stdev" and "stdev_" not in obj:
-                    new_items.append(("stdev_", value))
-                if isinstance(value, (dict, list)):
-                    add_stdev_(value)
-            for key, value in new_items:
-                obj[key] = value
-        elif isinstance(obj, list):
-            for item in obj:
-                add_stdev_(item)
+    Loads the manifest and the per-file rows of the previous run, if any.
+    """
+    if not os.path.exists(manifest_file) or not os.path.exists(rows_file):
+        return {}, None
+    with open(manifest_file, "r") as f:
+        manifest = json.load(f)
+    return manifest, pd.read_pickle(rows_file)
 
-    add_stdev_(data)
 
-    with open(file, "w") as f:
-        json.dump(data, f, indent=4)
+def save_gather_state(manifest_file: str, rows_file: str, manifest, rows):
+    os.makedirs(STATE_DIR, exist_ok=True)
+    rows.to_pickle(rows_file)
+    with open(manifest_file, "w") as f:
+        json.dump(manifest, f, indent=4)
 
 
-def gather_benchmarks(subset: str, machine: str, backend: str, hardware: str):
+def load_published_perf_df(perf_df: str) -> Optional[pd.DataFrame]:
+    """
+    Loads the perf dataframe currently published in the main repo, None if there is none
+    """
+    try:
+        return pd.read_csv(
+            hf_hub_download(repo_id=MAIN_REPO_ID, repo_type=REPO_TYPE, filename=perf_df)
+        )
+    except Exception as e:
+        print(f"Could not load the published {perf_df}: {e}")
+        return None
+
+
+def check_regressions(
+    benchmarks: pd.DataFrame,
+    perf_df: str,
+    regressions_file: str,
+) -> int:
+    """
+    Compares the new perf dataframe with the published one, writes the significant
+    changes to `regressions_file` and returns the number of regressions
+    """
+    published = load_published_perf_df(perf_df)
+    if published is None:
+        return 0
+
+    changes = detect_regressions(published, benchmarks)
+    changes.to_csv(regressions_file, index=False)
+    print(f"{perf_df}: {summarize_regressions(changes)}, see {regressions_file}")
+    return int(changes["regression"].astype(bool).sum())
+
+
+def gather_benchmarks(
+    subset: str,
+    machine: str,
+    backend: str,
+    hardware: str,
+    incremental: bool = False,
+    parse_pool: Optional[Executor] = None,
+    fail_on_regression: bool = False,
+) -> Tuple[int, bool]:
     """
     Gather the benchmarks for a given machine
+
+    In incremental mode, only the benchmark.json files that were added or changed since
+    the previous run are parsed and merged into the previous rows, and nothing is
+    uploaded when no file changed. When a `parse_pool` is given, the files are parsed
+    in it instead of in the calling thread.
+
+    The new perf dataframe is compared with the published one, and is not uploaded if
+    it has regressions and `fail_on_regression` is set. Returns the number of
+    regressions and whether the perf dataframe was uploaded.
     """
     perf_repo_id = PERF_REPO_ID.format(
         subset=subset, machine=machine, backend=backend, hardware=hardware
@@ -76,24 +151,91 @@ def gather_benchmarks(subset: str, machine: str, backend: str, hardware: str):
         allow_patterns=["**/benchmark.json"],
     )
 
+    files = {
+        os.path.relpath(file, snapshot): file
+        for file in glob(f"{snapshot}/**/benchmark.json", recursive=True)
+    }
+    manifest = {source: get_file_key(file) for source, file in files.items()}
+
+    manifest_file = MANIFEST.format(
+        subset=subset, machine=machine, backend=backend, hardware=hardware
+    )
+    rows_file = ROWS.format(
+        subset=subset, machine=machine, backend=backend, hardware=hardware
+    )
+    previous_manifest, previous_rows = (
+        load_gather_state(manifest_file, rows_file) if incremental else ({}, None)
+    )
+
+    changed = [
+        source
+        for source, key in manifest.items()
+        if previous_rows is None or previous_manifest.get(source) != key
+    ]
+    removed = set(previous_manifest) - set(manifest)
+
+    if previous_rows is not None and not changed and not removed:
+        print(f"No benchmark changed in {perf_repo_id}, skipping upload")
+        return 0, False
+
     dfs = []
-    for file in glob(f"{snapshot}/**/benchmark.json", recursive=True):
-        patch_json(file)
-        dfs.append(Benchmark.from_json(file).to_dataframe())
-    benchmarks = pd.concat(dfs, ignore_index=True)
+    if previous_rows is not None:
+        dfs.append(
+            previous_rows[~previous_rows[SOURCE_COLUMN].isin(set(changed) | removed)]
+        )
+    changed_files = [files[source] for source in changed]
+    if parse_pool is not None:
+        flat_benchmarks = parse_pool.map(
+            read_flat_benchmark, changed_files, chunksize=64
+        )
+    else:
+        flat_benchmarks = map(read_flat_benchmark, changed_files)
+
+    columns = BenchmarkColumns()
+    for source, flat_benchmark in zip(changed, flat_benchmarks):
+        flat_benchmark[SOURCE_COLUMN] = source
+        columns.append(flat_benchmark)
+    dfs.append(columns.to_dataframe())
+
+    rows = pd.concat(dfs, ignore_index=True)
+    if rows.empty:
+        raise ValueError(f"No benchmark found in {perf_repo_id}")
+
+    if previous_rows is not None:
+        print(
+            f"Parsed {len(changed)} new or changed benchmarks and dropped {len(removed)} "
+            f"removed ones out of {len(manifest)} in {perf_repo_id}"
+        )
+    benchmarks = rows.drop(columns=[SOURCE_COLUMN])
 
     perf_df = PERF_DF.format(
         subset=subset, machine=machine, backend=backend, hardware=hardware
     )
+    perf_parquet = PERF_PARQUET.format(
+        subset=subset, machine=machine, backend=backend, hardware=hardware
+    )
+    regressions_file = REGRESSIONS.format(
+        subset=subset, machine=machine, backend=backend, hardware=hardware
+    )
+    num_regressions = check_regressions(benchmarks, perf_df, regressions_file)
+    if num_regressions and fail_on_regression:
+        # not recorded in the gather state, so that the next incremental run retries it
+        print(f"Not uploading {perf_df} because of {num_regressions} regressions")
+        return num_regressions, False
+
+    save_gather_state(manifest_file, rows_file, manifest, rows)
     benchmarks.to_csv(perf_df, index=False)
+    write_perf_parquet(benchmarks, perf_parquet)
     create_repo(repo_id=MAIN_REPO_ID, repo_type=REPO_TYPE, private=False, exist_ok=True)
-    upload_file(
-        repo_id=MAIN_REPO_ID,
-        repo_type=REPO_TYPE,
-        path_in_repo=perf_df,
-        path_or_fileobj=perf_df,
-    )
-    print(f"Uploaded {perf_df} to {MAIN_REPO_ID}")
+    for path in (perf_df, perf_parquet):
+        upload_file(
+            repo_id=MAIN_REPO_ID,
+            repo_type=REPO_TYPE,
+            path_in_repo=path,
+            path_or_fileobj=path,
+        )
+        print(f"Uploaded {path} to {MAIN_REPO_ID}")
+    return num_regressions, True
 
 
 # def check_if_url_exists(url: str):
@@ -105,49 +247,185 @@ def gather_benchmarks(subset: str, machine: str, backend: str, hardware: str):
 #     return response.status_code == 200
 
 
-def update_perf_dfs():
+def report_unprocessed_dataset(subset: str, machine: str, backend: str, hardware: str):
+    print("Dataset not found for:")
+    print(f"  • Backend: {backend}")
+    print(f"  • Subset: {subset}")
+    print(f"  • Machine: {machine}")
+    print(f"  • Hardware Type: {hardware}")
+    url = f"{PERF_REPO_ID.format(subset=subset, machine=machine, backend=backend, hardware=hardware)}"
+
+    does_exist = repo_exists(url, repo_type="dataset")
+
+    if does_exist:
+        print(f"Dataset exists: {url} but could not be processed")
+
+
+def get_combinations():
+    hardware_configs = load_hardware_configs("llm_perf/hardware.yaml")
+    return [
+        (subset, hardware_config.machine, backend, hardware_config.hardware)
+        for hardware_config in hardware_configs
+        for subset in hardware_config.subsets
+        for backend in hardware_config.backends
+    ]
+
+
+def update_perf_dfs(
+    incremental: bool = False, max_workers: int = 1, fail_on_regression: bool = False
+) -> Tuple[int, List[Tuple[str, str, str, str]]]:
     """
     Update the performance dataframes for all machines
-    """
 
-    hardware_configs = load_hardware_configs("llm_perf/hardware.yaml")
+    With `max_workers` > 1 the combinations are refreshed concurrently: downloads and
+    uploads run in a pool of threads, while the JSON flattening of all combinations is
+    shared by a pool of processes, so a combination is parsed while others are still
+    downloading. Errors are reported in the same order as in the serial path.
+
+    Returns the total number of regressions found against the published dataframes,
+    and the combinations whose perf dataframe was uploaded.
+    """
 
-    for hardware_config in hardware_configs:
-        for subset in hardware_config.subsets:
-            for backend in hardware_config.backends:
+    combinations = get_combinations()
+    start = time.perf_counter()
+    num_regressions = 0
+    refreshed = []
+
+    if max_workers <= 1:
+        for combination in combinations:
+            try:
+                combination_regressions, uploaded = gather_benchmarks(
+                    *combination,
+                    incremental=incremental,
+                    fail_on_regression=fail_on_regression,
+                )
+            except Exception:
+                report_unprocessed_dataset(*combination)
+                continue
+            num_regressions += combination_regressions
+            if uploaded:
+                refreshed.append(combination)
+    else:
+        with (
+            ProcessPoolExecutor(
+                max_workers=os.cpu_count(), mp_context=get_context("spawn")
+            ) as parse_pool,
+            ThreadPoolExecutor(max_workers=max_workers) as io_pool,
+        ):
+            futures = [
+                io_pool.submit(
+                    gather_benchmarks,
+                    *combination,
+                    incremental=incremental,
+                    parse_pool=parse_pool,
+                    fail_on_regression=fail_on_regression,
+                )
+                for combination in combinations
+            ]
+            for combination, future in zip(combinations, futures):
                 try:
-                    gather_benchmarks(
-                        subset,
-                        hardware_config.machine,
-                        backend,
-                        hardware_config.hardware,
-                    )
+                    combination_regressions, uploaded = future.result()
                 except Exception:
-                    print("Dataset not found for:")
-                    print(f"  • Backend: {backend}")
-                    print(f"  • Subset: {subset}")
-                    print(f"  • Machine: {hardware_config.machine}")
-                    print(f"  • Hardware Type: {hardware_config.hardware}")
-                    url = f"{PERF_REPO_ID.format(subset=subset, machine=hardware_config.machine, backend=backend, hardware=hardware_config.hardware)}"
+                    report_unprocessed_dataset(*combination)
+                    continue
+                num_regressions += combination_regressions
+                if uploaded:
+                    refreshed.append(combination)
+
+    print(
+        f"Refreshed {len(combinations)} perf dataframes with {max_workers} workers "
+        f"in {time.perf_counter() - start:.1f}s"
+    )
+    return num_regressions, refreshed
+
+
+def load_llm_df() -> Optional[pd.DataFrame]:
+    """
+    Loads the llm dataframe, from the local data directory or the main repo, None if it
+    is not available
+    """
+    try:
+        if not os.path.exists(LLM_DF):
+            return pd.read_csv(
+                hf_hub_download(
+                    repo_id=MAIN_REPO_ID, repo_type=REPO_TYPE, filename=LLM_DF
+                )
+            )
+        return pd.read_csv(LLM_DF)
+    except Exception as e:
+        print(f"Could not load {LLM_DF}, the leaderboard will lack its columns: {e}")
+        return None
+
+
+def load_published_leaderboard_table() -> Optional[pd.DataFrame]:
+    """
+    Loads the leaderboard table currently published in the main repo, None if there is
+    none
+    """
+    try:
+        return pd.read_parquet(
+            hf_hub_download(
+                repo_id=MAIN_REPO_ID, repo_type=REPO_TYPE, filename=LEADERBOARD
+            )
+        )
+    except Exception as e:
+        print(f"Could not load the published {LEADERBOARD}: {e}")
+        return None
+
+
+def update_leaderboard_table(refreshed: List[Tuple[str, str, str, str]]):
+    """
+    Joins the perf dataframes of all combinations with the llm dataframe into the
+    leaderboard table, and uploads it if it differs from the published one
 
-                    does_exist = repo_exists(url, repo_type="dataset")
+    The combinations in `refreshed` use the perf dataframe just uploaded, the others
+    (unchanged, held back because of regressions or failed) the published one, so that
+    the table always matches the published perf dataframes.
+    """
+    perf_dfs = {}
+    for subset, machine, backend, hardware in get_combinations():
+        perf_df = PERF_DF.format(
+            subset=subset, machine=machine, backend=backend, hardware=hardware
+        )
+        if (subset, machine, backend, hardware) in refreshed:
+            df = pd.read_csv(perf_df)
+        else:
+            df = load_published_perf_df(perf_df)
+        if df is not None:
+            perf_dfs[(subset, machine, backend, hardware)] = df
+
+    table = build_leaderboard_table(perf_dfs, load_llm_df())
+    write_leaderboard_table(table, LEADERBOARD)
+    published = load_published_leaderboard_table()
+    if published is not None and pd.read_parquet(LEADERBOARD).equals(published):
+        print(f"{LEADERBOARD} did not change, skipping upload")
+        return
 
-                    if does_exist:
-                        print(f"Dataset exists: {url} but could not be processed")
+    create_repo(repo_id=MAIN_REPO_ID, repo_type=REPO_TYPE, private=False, exist_ok=True)
+    upload_file(
+        repo_id=MAIN_REPO_ID,
+        repo_type=REPO_TYPE,
+        path_in_repo=LEADERBOARD,
+        path_or_fileobj=LEADERBOARD,
+    )
+    print(
+        f"Uploaded {LEADERBOARD} with {len(table)} rows from {len(perf_dfs)} perf "
+        f"dataframes to {MAIN_REPO_ID}"
+    )
 
 
 def update_llm_df():
     """
     Scrape the open-llm-leaderboard and update the leaderboard dataframe
     """
-    
+
     scrapping_script = """
     git clone https://github.com/Weyaxi/scrape-open-llm-leaderboard.git
     pip install -r scrape-open-llm-leaderboard/requirements.txt -q
     python scrape-open-llm-leaderboard/main.py
     rm -rf scrape-open-llm-leaderboard
     """
-    
+
     subprocess.run(scrapping_script, shell=True)
     create_repo(repo_id=MAIN_REPO_ID, repo_type=REPO_TYPE, exist_ok=True, private=False)
     upload_file(
@@ -158,9 +436,17 @@ def update_llm_df():
     )
 
 
-def update_llm_perf_leaderboard():
+def update_llm_perf_leaderboard(
+    incremental: bool = False, max_workers: int = 1, fail_on_regression: bool = False
+) -> int:
     # update_llm_df() # TO FIX: open-llm scraper is broken otherwise use https://huggingface.co/datasets/open-llm-leaderboard/contents directly
-    update_perf_dfs()
+    num_regressions, refreshed = update_perf_dfs(
+        incremental=incremental,
+        max_workers=max_workers,
+        fail_on_regression=fail_on_regression,
+    )
+    update_leaderboard_table(refreshed)
+    return num_regressions
 
 
 if __name__ == "__main__":
@@ -13,6 +13,8 @@ INSTALL_REQUIRES = [
     "transformers",
     "huggingface_hub[hf_transfer]",
     "datasets>=2.14.6",
+    "pyarrow",
+    "psutil",
     "beautifulsoup4",
     "optimum-benchmark @ git+https://github.com/huggingface/optimum-benchmark.git",
 ]
@@ -33,6 +35,7 @@ EXTRAS_REQUIRE = {
         "bitsandbytes",
         "autoawq",
         "torchao",
+        "nvidia-ml-py",
     ],
 }
 